@@ -1,5 +1,10 @@
 import graphene
+from django.conf import settings
+from graphene.validation import depth_limit_validator
+from graphql.language import FragmentDefinitionNode
+from graphql.validation import ValidationRule, specified_rules
 
+from crm.cost import cost_limit_validator
 from crm.schema import (
     Query as CRMQuery,
     Mutation as CRMMutation
@@ -16,3 +21,52 @@ class Mutation(CRMMutation, graphene.ObjectType):
     pass
 
 schema = graphene.Schema(query=Query, mutation=Mutation)
+
+
+def known_fragments_only(rule):
+    """
+    Runs ``rule`` only on documents whose fragment spreads are all defined.
+    graphene's depth rule raises ``KeyError`` on an unknown spread, which
+    ``KnownFragmentNames`` reports instead.
+    """
+    class KnownFragmentsRule(ValidationRule):
+        def __init__(self, context):
+            super().__init__(context)
+            definitions = context.document.definitions
+            fragments = {
+                definition.name.value
+                for definition in definitions
+                if isinstance(definition, FragmentDefinitionNode)
+            }
+            spreads = {
+                spread.name.value
+                for definition in definitions
+                for spread in context.get_fragment_spreads(definition.selection_set)
+            }
+            if spreads <= fragments:
+                rule(context)
+
+    return KnownFragmentsRule
+
+# Rules documents are validated against before execution, on top of the
+# GraphQL specification rules.
+validation_rules = (
+    *specified_rules,
+    known_fragments_only(
+        depth_limit_validator(max_depth=getattr(settings, 'CRM_GRAPHQL_MAX_DEPTH', 10))
+    ),
+)
+
+
+def cost_validation_rules(variables=None, callback=None):
+    """
+    Rules bounding the estimated cost of an operation. Page sizes usually
+    come from variables, so these run per request rather than per document.
+    """
+    return (
+        cost_limit_validator(
+            max_cost=getattr(settings, 'CRM_GRAPHQL_MAX_COST', 5000),
+            variables=variables,
+            callback=callback,
+        ),
+    )
@@ -2,14 +2,23 @@
 
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
 
+from crm.views import (
+    AsyncGraphQLView, CachedGraphQLView, document_cache_stats, export_orders_view, graphql_metrics,
+    import_upload,
+)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path(
         "graphql",
-        csrf_exempt(GraphQLView.as_view(graphiql=True)),
-    )
+        csrf_exempt(CachedGraphQLView.as_view(graphiql=True)),
+    ),
+    path("graphql/async", csrf_exempt(AsyncGraphQLView.as_view())),
+    path("graphql/cache-stats", document_cache_stats),
+    path("graphql/metrics", graphql_metrics),
+    path("import/<str:kind>", import_upload),
+    path("export/orders", export_orders_view),
 ]
@@ -0,0 +1,529 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Case, Count, DateTimeField, DecimalField, F, IntegerField, Max, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Customer, CustomerSummary, Product, Order, OrderItem
+from .response_cache import response_cache
+from .search import customer_index
+
+DEFAULT_BATCH_SIZE = getattr(settings, 'CRM_BULK_BATCH_SIZE', 1000)
+
+
+def chunked(items, size):
+    """Yields successive lists of at most ``size`` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def format_validation_error(error):
+    if hasattr(error, 'message_dict'):
+        return "; ".join(
+            f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items()
+        )
+    return " ".join(error.messages)
+
+
+# --- Customers ---
+def validate_customer(data):
+    """
+    Builds an unsaved Customer from input data and validates it in memory
+    with the model's field rules. Uniqueness is checked separately in bulk.
+    """
+    customer = Customer(
+        name=data.get('name'),
+        # Imported rows may hold numbers or other JSON values
+        email=str(data.get('email') or '').strip(),
+        phone=data.get('phone') or None,
+    )
+    customer.clean_fields(exclude=['created_at', 'updated_at'])
+    return customer
+
+
+def bulk_create_customers(rows, batch_size=None):
+    """
+    Validates and inserts customers in chunks inside one transaction.
+
+    Emails are checked against each other in memory and against the
+    ``email`` unique index with one ``IN`` lookup per chunk, so a chunk is
+    written with a single ``bulk_create``.
+
+    Args:
+        rows (list): Dicts with ``name``, ``email`` and optional ``phone``.
+        batch_size (int): Rows per lookup and INSERT.
+
+    Returns:
+        tuple: (created customers, list of per-row error messages)
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    created = []
+    errors = []
+
+    candidates = []
+    seen_emails = set()
+    for data in rows:
+        email = data.get('email')
+        try:
+            customer = validate_customer(data)
+        except ValidationError as e:
+            errors.append(f"Error for email {email}: {format_validation_error(e)}")
+            continue
+
+        if customer.email in seen_emails:
+            errors.append(f"Error for email {email}: Duplicate email in input.")
+            continue
+        seen_emails.add(customer.email)
+        candidates.append(customer)
+
+    with transaction.atomic():
+        for chunk in chunked(candidates, batch_size):
+            existing = set(
+                Customer.objects
+                .filter(email__in=[customer.email for customer in chunk])
+                .values_list('email', flat=True)
+            )
+            new_customers = []
+            for customer in chunk:
+                if customer.email in existing:
+                    errors.append(f"Error for email {customer.email}: Email already exists.")
+                else:
+                    new_customers.append(customer)
+
+            try:
+                with transaction.atomic():
+                    created.extend(Customer.objects.bulk_create(new_customers, batch_size=batch_size))
+            except IntegrityError:
+                # A concurrent writer took one of the emails; fall back to
+                # row-by-row inserts so only the conflicting rows fail.
+                for customer in new_customers:
+                    try:
+                        with transaction.atomic():
+                            customer.save(force_insert=True)
+                        created.append(customer)
+                    except IntegrityError as e:
+                        errors.append(f"Error for email {customer.email}: {str(e)}")
+
+        # bulk_create does not send post_save
+        if created:
+            customer_index.update(created)
+            response_cache.invalidate('customer')
+
+    return created, errors
+
+
+# --- Customer Summaries ---
+def record_orders(orders, batch_size=None):
+    """
+    Adds newly placed orders to their customers' summaries.
+
+    Summary rows are created for first-time customers with one
+    ``bulk_create``, then every chunk of customers is incremented with one
+    ``UPDATE ... SET order_count = order_count + n``, so concurrent orders
+    of the same customer add up instead of overwriting each other. Call
+    inside the transaction that saves the orders.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    deltas = {}
+    for order in orders:
+        count, value, last_date = deltas.get(order.customer_id, (0, Decimal('0'), order.order_date))
+        deltas[order.customer_id] = (
+            count + 1, value + order.total_amount, max(last_date, order.order_date)
+        )
+    if not deltas:
+        return
+
+    CustomerSummary.objects.bulk_create(
+        [CustomerSummary(customer_id=customer_id) for customer_id in deltas],
+        ignore_conflicts=True,
+    )
+
+    def per_customer(customer_ids, index, output_field):
+        return Case(
+            *[When(pk=customer_id, then=Value(deltas[customer_id][index])) for customer_id in customer_ids],
+            output_field=output_field,
+        )
+
+    for customer_ids in chunked(sorted(deltas), batch_size):
+        last_date = per_customer(customer_ids, 2, DateTimeField())
+        CustomerSummary.objects.filter(pk__in=customer_ids).update(
+            order_count=F('order_count') + per_customer(customer_ids, 0, IntegerField()),
+            lifetime_value=F('lifetime_value') + per_customer(
+                customer_ids, 1, DecimalField(max_digits=14, decimal_places=2)
+            ),
+            last_order_date=Greatest(Coalesce('last_order_date', last_date), last_date),
+            updated_at=timezone.now(),
+        )
+    # Summaries are read as part of their customer
+    response_cache.invalidate('customer')
+
+
+def rebuild_customer_summaries(batch_size=None):
+    """
+    Recomputes every customer summary from the orders table.
+
+    Repairs summaries after orders were written without ``create_orders``,
+    such as deletions or admin edits. Customers are aggregated in
+    primary-key chunks, each replaced inside one transaction.
+
+    Returns:
+        int: The number of customers with at least one order.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    summarized = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Customer.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+
+            rows = (
+                Order.objects.filter(customer_id__in=ids)
+                .values('customer_id')
+                .annotate(
+                    order_count=Count('pk'),
+                    lifetime_value=Sum('total_amount'),
+                    last_order_date=Max('order_date'),
+                )
+                .order_by()
+            )
+            summaries = [
+                CustomerSummary(
+                    customer_id=row['customer_id'],
+                    order_count=row['order_count'],
+                    lifetime_value=row['lifetime_value'],
+                    last_order_date=row['last_order_date'],
+                )
+                for row in rows
+            ]
+            CustomerSummary.objects.filter(customer_id__in=ids).delete()
+            CustomerSummary.objects.bulk_create(summaries)
+            summarized += len(summaries)
+
+    response_cache.invalidate('customer')
+    return summarized
+
+
+# --- Orders ---
+def parse_ids(values):
+    """Parses ID arguments to integers, returning None if any is malformed."""
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_order_lines(data):
+    """
+    Reads the products of an order input into ``{product_id: quantity}``.
+
+    ``productIds`` add one unit of each distinct product and ``items`` add
+    their ``quantity``. Returns ``(raw_ids, lines)``, with ``lines`` None if
+    any ID is malformed.
+    """
+    product_ids = list(data.get('productIds') or [])
+    items = list(data.get('items') or [])
+    raw_ids = product_ids + [item.get('productId') for item in items]
+    ids = parse_ids(raw_ids)
+    if ids is None:
+        return raw_ids, None
+
+    # An order holds each product once
+    lines = dict.fromkeys(ids[:len(product_ids)], 1)
+    for product_id, item in zip(ids[len(product_ids):], items):
+        quantity = item.get('quantity')
+        lines[product_id] = lines.get(product_id, 0) + (1 if quantity is None else quantity)
+    return raw_ids, lines
+
+
+class StockShortage(Exception):
+    """Rolls back a stock reservation that could not take every line."""
+
+
+def reserve_stock(demand, batch_size=None):
+    """
+    Takes ``demand`` (``{product_id: quantity}``) off the products' stock,
+    all or nothing, inside the caller's transaction.
+
+    Each chunk of products is reserved with one conditional
+    ``UPDATE ... SET stock = stock - qty WHERE stock >= qty``, so a
+    concurrent order can never take stock this one already counted. Where
+    the backend supports row locks, the rows are locked in primary-key
+    order first, so concurrent reservations cannot deadlock.
+
+    Returns:
+        bool: Whether every product had enough stock. On False nothing
+        was reserved.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    try:
+        with transaction.atomic():
+            for ids in chunked(sorted(demand), batch_size):
+                products = Product.objects.filter(pk__in=ids)
+                if connection.features.has_select_for_update:
+                    list(products.select_for_update().order_by('pk').values_list('pk', flat=True))
+                quantity = Case(
+                    *[When(pk=product_id, then=Value(demand[product_id])) for product_id in ids],
+                    output_field=IntegerField(),
+                )
+                updated = products.filter(stock__gte=quantity).update(
+                    stock=F('stock') - quantity, updated_at=timezone.now()
+                )
+                if updated != len(ids):
+                    raise StockShortage()
+    except StockShortage:
+        return False
+    return True
+
+
+def stock_shortage_error(demand):
+    short_ids = [
+        str(product_id) for product_id, stock in
+        Product.objects.filter(pk__in=demand).order_by('pk').values_list('pk', 'stock')
+        if stock < demand[product_id]
+    ]
+    return f"Error: Insufficient stock for product IDs: {', '.join(short_ids)}"
+
+
+def reserve_order_stock(pending):
+    """
+    Reserves the stock of several orders, one message per order.
+
+    The combined demand of all orders is tried first, which is a single
+    statement per chunk in the common case. If any product runs short,
+    each order is retried on its own so only the orders that cannot be
+    filled are rejected.
+
+    Returns:
+        list: None for every reserved order, or its error message.
+    """
+    demands = []
+    for _, items in pending:
+        demand = {}
+        for item in items:
+            demand[item.product_id] = demand.get(item.product_id, 0) + item.quantity
+        demands.append(demand)
+
+    combined = {}
+    for demand in demands:
+        for product_id, quantity in demand.items():
+            combined[product_id] = combined.get(product_id, 0) + quantity
+    if reserve_stock(combined):
+        return [None] * len(pending)
+    if len(pending) == 1:
+        return [stock_shortage_error(combined)]
+    return [None if reserve_stock(demand) else stock_shortage_error(demand) for demand in demands]
+
+
+def create_orders(order_inputs):
+    """
+    Places several orders with a fixed number of statements.
+
+    Customers and products for every order are fetched with one lookup
+    each, and every line captures its product's current price, so totals
+    and order history no longer depend on later price changes. The orders
+    and their ``OrderItem`` rows are written with one ``bulk_create`` each
+    inside a single transaction, after their stock was reserved with
+    conditional updates (see ``reserve_stock``). Orders that would take a
+    product's stock below zero are rejected without touching it.
+
+    Args:
+        order_inputs (list): Items with ``customerId`` and ``productIds``
+            and/or ``items`` of ``productId`` and ``quantity``.
+
+    Returns:
+        list: One ``(order, items, error)`` tuple per input, where
+        ``order`` is None and ``error`` is a message for rejected inputs.
+    """
+    parsed = []
+    customer_ids = set()
+    product_ids = set()
+    for data in order_inputs:
+        customer_id = parse_ids([data.get('customerId')])
+        raw_ids, lines = parse_order_lines(data)
+        parsed.append((customer_id[0] if customer_id else None, lines, raw_ids))
+        if customer_id:
+            customer_ids.add(customer_id[0])
+        if lines:
+            product_ids.update(lines)
+
+    customers = Customer.objects.only('pk').in_bulk(customer_ids)
+    products = Product.objects.in_bulk(product_ids)
+
+    results = []
+    pending = []
+    for customer_id, lines, raw_ids in parsed:
+        if customer_id not in customers:
+            results.append((None, None, "Error creating order: Customer not found."))
+            continue
+        if not raw_ids:
+            results.append((None, None, "Error: An order must contain at least one product."))
+            continue
+        if lines is None or any(product_id not in products for product_id in lines):
+            missing_ids = [
+                str(raw_id) for raw_id in raw_ids
+                if parse_ids([raw_id]) is None or int(raw_id) not in products
+            ]
+            results.append((
+                None, None,
+                f"Error: Product(s) not found with IDs: {', '.join(missing_ids)}"
+            ))
+            continue
+        if any(quantity < 1 for quantity in lines.values()):
+            results.append((None, None, "Error: Quantity must be at least 1."))
+            continue
+
+        order = Order(customer=customers[customer_id])
+        items = [
+            OrderItem(
+                order=order,
+                product=products[product_id],
+                quantity=quantity,
+                unit_price=products[product_id].price,
+            )
+            for product_id, quantity in lines.items()
+        ]
+        order.total_amount = sum(item.line_total for item in items)
+        pending.append((len(results), order, items))
+        results.append((order, items, None))
+
+    if not pending:
+        return results
+
+    with transaction.atomic():
+        errors = reserve_order_stock([(order, items) for _, order, items in pending])
+        reserved = []
+        for (index, order, items), error in zip(pending, errors):
+            if error:
+                results[index] = (None, None, error)
+                continue
+            for item in items:
+                item.product.stock -= item.quantity
+            reserved.append((order, items))
+        pending = reserved
+        # Queryset updates do not send post_save
+        response_cache.invalidate('product')
+        if not pending:
+            return results
+
+        orders = [order for order, _ in pending]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save(force_insert=True)
+
+        # The order foreign keys are filled from the saved orders
+        OrderItem.objects.bulk_create([item for _, items in pending for item in items])
+        record_orders(orders)
+        response_cache.invalidate('order')
+
+    return results
+
+
+# --- Products ---
+def supports_update_returning():
+    """Whether the default database can return rows from an UPDATE."""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+
+
+def update_returning(product_ids, threshold, increment):
+    """
+    Restocks low-stock products in one ``UPDATE ... RETURNING`` statement.
+    Passing ``product_ids`` limits the update to those rows.
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f"UPDATE {quote(Product._meta.db_table)} "
+        f"SET {quote('stock')} = {quote('stock')} + %s, {quote('updated_at')} = %s "
+        f"WHERE {quote('stock')} < %s"
+    )
+    params = [increment, timezone.now(), threshold]
+    if product_ids is not None:
+        sql += f" AND {quote('id')} IN ({', '.join(['%s'] * len(product_ids))})"
+        params.extend(product_ids)
+    columns = ', '.join(quote(field.column) for field in Product._meta.concrete_fields)
+    sql += f" RETURNING {columns}"
+    return list(Product.objects.raw(sql, params))
+
+
+def restock_low_stock_products(threshold=10, increment=10, return_products=True,
+                               lock=False, batch_size=None):
+    """
+    Adds ``increment`` to the stock of every product below ``threshold``
+    using set-based ``stock = stock + N`` updates.
+
+    Without ``lock`` this is a single UPDATE (with RETURNING when the
+    updated rows are wanted and the backend supports it). With ``lock`` the
+    catalogue is walked in primary-key chunks, each locked with
+    ``SELECT ... FOR UPDATE`` and updated in its own short transaction, so
+    concurrent writers never wait on the whole table and memory stays flat.
+
+    Returns:
+        tuple: (number of updated products, updated products or None)
+    """
+    if increment <= 0:
+        raise ValueError("Increment must be a positive number.")
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    low_stock = Product.objects.filter(stock__lt=threshold)
+    updated_products = [] if return_products else None
+
+    if not lock:
+        if not return_products:
+            updated_count = low_stock.update(stock=F('stock') + increment, updated_at=timezone.now())
+            # Queryset updates do not send post_save
+            response_cache.invalidate('product')
+            return updated_count, None
+        with transaction.atomic():
+            if supports_update_returning():
+                updated_products = update_returning(None, threshold, increment)
+            else:
+                ids = list(low_stock.select_for_update().values_list('pk', flat=True))
+                Product.objects.filter(pk__in=ids).update(
+                    stock=F('stock') + increment, updated_at=timezone.now()
+                )
+                updated_products = list(Product.objects.filter(pk__in=ids).order_by('pk'))
+            response_cache.invalidate('product')
+        return len(updated_products), updated_products
+
+    updated_count = 0
+    last_pk = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                low_stock.filter(pk__gt=last_pk)
+                .select_for_update()
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+            response_cache.invalidate('product')
+
+            if return_products and supports_update_returning():
+                products = update_returning(ids, threshold, increment)
+                updated_products.extend(products)
+                updated_count += len(products)
+                continue
+
+            updated_count += Product.objects.filter(pk__in=ids, stock__lt=threshold).update(
+                stock=F('stock') + increment, updated_at=timezone.now()
+            )
+            if return_products:
+                updated_products.extend(Product.objects.filter(pk__in=ids).order_by('pk'))
+
+    return updated_count, updated_products
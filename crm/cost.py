@@ -0,0 +1,117 @@
+from django.conf import settings
+from graphql import GraphQLError
+from graphql.execution.values import get_argument_values
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode, OperationDefinitionNode
+from graphql.type import get_named_type, get_nullable_type, is_composite_type, is_list_type
+from graphql.validation import ValidationRule
+from graphene_django.settings import graphene_settings
+
+
+def is_connection_type(graphql_type):
+    fields = getattr(graphql_type, 'fields', {})
+    return 'edges' in fields and 'pageInfo' in fields
+
+
+class CostEstimator:
+    """
+    Estimates how many objects executing an operation may resolve.
+
+    Every object-typed field costs one object per parent. Connections
+    multiply their subtree by ``first``/``last``, or the relay maximum when
+    neither is given, and plain lists by an assumed ``list_size``. Scalars
+    are free, since they are read from objects that were already loaded.
+    """
+    def __init__(self, schema, fragments, variables=None, list_size=None):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables or {}
+        self.list_size = list_size or getattr(settings, 'CRM_GRAPHQL_LIST_SIZE', 10)
+        self.max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+
+    def page_size(self, node, field_def):
+        try:
+            args = get_argument_values(field_def, node, self.variables)
+        except GraphQLError:
+            # Missing or invalid variables are reported by execution; assume the worst
+            args = {}
+        size = args.get('first')
+        if size is None:
+            size = args.get('last')
+        if size is None or (self.max_limit and size > self.max_limit):
+            # Pages larger than the maximum are refused by the connection
+            size = self.max_limit
+        # Negative pages are refused too, and must not offset the cost of siblings
+        return max(size, 0)
+
+    def operation_cost(self, operation):
+        root_type = self.schema.get_root_type(operation.operation)
+        return self.selection_cost(root_type, operation.selection_set, 1)
+
+    def selection_cost(self, parent_type, selection_set, multiplier):
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_def = getattr(parent_type, 'fields', {}).get(selection.name.value)
+                if field_def is None or not is_composite_type(get_named_type(field_def.type)):
+                    continue
+                field_type = get_named_type(field_def.type)
+                if is_connection_type(field_type):
+                    # One connection object, whose edges multiply the subtree
+                    cost += multiplier
+                    children = multiplier * self.page_size(selection, field_def)
+                elif is_list_type(get_nullable_type(field_def.type)) and not is_connection_type(parent_type):
+                    children = multiplier * self.list_size
+                    cost += children
+                else:
+                    children = multiplier
+                    cost += children
+                if selection.selection_set:
+                    cost += self.selection_cost(field_type, selection.selection_set, children)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                cost += self.selection_cost(fragment_type, selection.selection_set, multiplier)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments.get(selection.name.value)
+                if fragment is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                    cost += self.selection_cost(fragment_type, fragment.selection_set, multiplier)
+        return cost
+
+
+def cost_limit_validator(max_cost, variables=None, callback=None):
+    """
+    Returns a validation rule that rejects operations whose estimated cost
+    exceeds ``max_cost``, in the style of graphene's ``depth_limit_validator``.
+
+    ``callback`` receives a dict mapping each operation name (None for an
+    anonymous operation) to its estimated cost.
+    """
+    class CostLimitValidator(ValidationRule):
+        def __init__(self, context):
+            super().__init__(context)
+            document = context.document
+            fragments = {
+                definition.name.value: definition
+                for definition in document.definitions
+                if definition.kind == 'fragment_definition'
+            }
+            estimator = CostEstimator(context.schema, fragments, variables)
+
+            costs = {}
+            for definition in document.definitions:
+                if not isinstance(definition, OperationDefinitionNode):
+                    continue
+                name = definition.name.value if definition.name else None
+                costs[name] = cost = estimator.operation_cost(definition)
+                if cost > max_cost:
+                    context.report_error(GraphQLError(
+                        f"Query cost {cost} exceeds the maximum cost of {max_cost}.",
+                        definition,
+                        extensions={'code': 'QUERY_COST_EXCEEDED', 'cost': cost, 'maxCost': max_cost},
+                    ))
+            if callable(callback):
+                callback(costs)
+
+    return CostLimitValidator
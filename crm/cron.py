@@ -2,11 +2,14 @@ import datetime
 import os
 import sys
 
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from gql import gql
+
+from crm.graphql_client import get_client
+from crm.metrics import timed_job
 
 LOG_FILE = "/tmp/crm_heartbeat_log.txt"
 
+@timed_job
 def log_crm_heartbeat():
     """Logs a heartbeat message to a file every 5 minutes and optionally
     checks the GraphQL endpoint for health.
@@ -17,12 +20,12 @@ def log_crm_heartbeat():
         
         # Verify if app is running
         graphql_status = "UNKWOWN"
-        try transport = RequestsHTTPTransport(url="http://localhost:8000/graphql")
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        query = gql(" {hello }")
-        result = client.execute(query)
-        if result.get('hello') == "Hello, GraphQL!":
-            graphql_status = "OK"
+        try:
+            client = get_client()
+            query = gql(" {hello }")
+            result = client.execute(query)
+            if result.get('hello') == "Hello, GraphQL!":
+                graphql_status = "OK"
         except Exception:
             graphql_status = "ERROR"
         
@@ -42,23 +45,20 @@ def log_crm_heartbeat():
         sys.stderr.write(error_message + "\n")
 
 
+@timed_job
 def update_low_stock():
     """Executes a GraphQL mutation to update low-stock products and logs the result.
     """
     # GraphQL Setup
-    transport = RequestsHTTPTransport(url="http://localhost:8000/graphql")
-    client = Client(transport=transport, fetch_schema_from_transport=True)
+    client = get_client()
 
     # Define the GraphQL mutation string
     mutation_query = gql(
         """
         mutation {
-          updateLowStockProducts {
+          updateLowStockProducts(lockRows: true) {
             message
-            updatedProducts {
-              name
-              stock
-            }
+            updatedCount
           }
         }
         """
@@ -72,19 +72,14 @@ def update_low_stock():
         result = client.execute(mutation_query)
         data = result.get("updateLowStockProducts")
         message = data.get("message")
-        updated_products = data.get("updatedProducts", [])
+        updated_count = data.get("updatedCount", 0)
         
-        # Log the result
+        # Log the result. Only the count is fetched so the job stays
+        # constant-memory however many products are restocked.
         with open(LOG_FILE, "a") as f:
             timestamp = datetime.datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
             f.write(f"[{timestamp}] - {message}\n")
-            
-            if updated_products:
-                f.write(f"[{timestamp}] - Updated Products:\n")
-                for product in updated_products:
-                    log_entry = f"  - Name: {product['name']}, New Stock: {product['stock']}"
-                    f.write(log_entry + "\n")
-                    print(log_entry) # Also print to console
+            f.write(f"[{timestamp}] - Updated Products: {updated_count}\n")
             
         print(f"Mutation result: {message}")
         
@@ -1,23 +1,34 @@
+import os
 import sys
 import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from gql import gql
 
-print("Order reminders processed!")
+# --- Django Setup ---
+# This script is run directly by cron, so make the project importable and
+# load its settings to execute queries in-process.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql_crm.settings')
 
-# --- GraphQL Setup ---
-transport = RequestsHTTPTransport(
-    url='http://localhost:8000/graphql/',
-)
+import django
+django.setup()
+
+from crm.graphql_client import get_client
+from crm.metrics import timed_job
 
-# Create a Graphql client using the defined transport
-client = Client(transport=transport, fetch_schema_from_transport=True)
+LOG_FILE = "/tmp/order_reminders_log.txt"
 
-# Define Graph Qeury
+# Define Graph Qeury. Orders are walked one keyset page at a time so a busy
+# week never has to fit in a single response.
 query = gql(
     """
-    query FindRecentOrders($startDate: Date!, $endDate: Date!){
-        allOrders(orderDate_Gte: $startDate, orderDate_Lte: $endDate) {
+    query FindRecentOrders($startDate: DateTime!, $endDate: DateTime!, $first: Int!, $after: String){
+        allOrders(orderDate_Gte: $startDate, orderDate_Lte: $endDate, first: $first, after: $after) {
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
             edges {
                 node {
                     id
@@ -31,36 +42,77 @@ query = gql(
     """
 )
 
-try:
-    end_date = datetime.date.today()
-    start_date = end_date - datetime.timedelta(days=7)
-
-    params = {"startDate": start_date, "endDate": end_date}
-    result = client.execute(query, variable_values=params)
-
-    orders = result.get('allOrders', {}).get('edges', [])
-    
-    log_file_path = "/tmp/order_reminders_log.txt"
-    with open(log_file_path, "a") as log_file:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        if not orders:
-            log_message = f"[{timestamp}] - No new orders found in the last 7 days."
-            log_file.write(log_message + "\n")
-            print(log_message)
-        
-        for edge in orders:
-            order_node = edge.get('node')
-            if order_node:
+
+def iter_recent_orders(client, start_date, end_date, page_size):
+    """Yields order nodes placed between the two dates, one page in memory at a time."""
+    after = None
+    while True:
+        params = {"startDate": start_date, "endDate": end_date, "first": page_size, "after": after}
+        result = client.execute(query, variable_values=params)
+        connection = result.get('allOrders', {})
+
+        for edge in connection.get('edges', []):
+            if edge.get('node'):
+                yield edge['node']
+
+        page_info = connection.get('pageInfo', {})
+        if not page_info.get('hasNextPage'):
+            return
+        after = page_info.get('endCursor')
+
+
+def write_reminders(log_file, lines):
+    log_file.write("".join(line + "\n" for line in lines))
+    log_file.flush()
+    print("\n".join(lines))
+
+
+@timed_job
+def send_order_reminders(days=7, page_size=100, batch_size=500):
+    """
+    Logs one reminder per customer who ordered in the last ``days`` days.
+
+    Orders are streamed page by page, customers are deduplicated by email,
+    and reminders are written in batches of ``batch_size``, so memory is
+    bounded by a page plus the set of distinct customers.
+    """
+    try:
+        client = get_client()
+        end_date = datetime.datetime.now(datetime.timezone.utc)
+        start_date = end_date - datetime.timedelta(days=days)
+
+        with open(LOG_FILE, "a") as log_file:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            seen_emails = set()
+            batch = []
+
+            for order_node in iter_recent_orders(client, start_date, end_date, page_size):
+                customer_email = (order_node.get('customer') or {}).get('email')
+                if not customer_email or customer_email in seen_emails:
+                    continue
+                seen_emails.add(customer_email)
+
                 order_id = order_node.get('id')
-                customer_email = order_node.get('customer', {}).get('email')
-                
-                log_message = f"[{timestamp}] - Reminder for Order ID: {order_id}, Customer Email: {customer_email}"
-                log_file.write(log_message + "\n")
-                print(log_message)
-except Exception as e:
-    # Log any errors that occur during the process
-    log_file_path = "/tmp/order_reminders_log.txt"
-    with open(log_file_path, "a") as log_file:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"[{timestamp}] - ERROR: {e}\n")
-    sys.stderr.write(f"An error occurred: {e}\n")
\ No newline at end of file
+                batch.append(f"[{timestamp}] - Reminder for Order ID: {order_id}, Customer Email: {customer_email}")
+                if len(batch) >= batch_size:
+                    write_reminders(log_file, batch)
+                    batch = []
+
+            if batch:
+                write_reminders(log_file, batch)
+
+            if not seen_emails:
+                write_reminders(log_file, [f"[{timestamp}] - No new orders found in the last {days} days."])
+
+        print("Order reminders processed!")
+        return len(seen_emails)
+    except Exception as e:
+        # Log any errors that occur during the process
+        with open(LOG_FILE, "a") as log_file:
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            log_file.write(f"[{timestamp}] - ERROR: {e}\n")
+        sys.stderr.write(f"An error occurred: {e}\n")
+
+
+if __name__ == "__main__":
+    send_order_reminders()
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def query_hash(query):
+    """The sha256 hex digest used as cache key and persisted query id."""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class CachedDocument:
+    """
+    A parsed query and the result of validating it against the schema.
+
+    Attributes:
+        query (str): The original query text, kept for persisted queries.
+        document (DocumentNode): The parsed document, or None if parsing failed.
+        errors (list): Syntax or validation errors; empty for valid documents.
+        normalized_hash (str): Hash of the printed document, set by the response cache.
+        dependencies (dict): Models each operation reads, set by the response cache.
+    """
+    def __init__(self, query, document, errors):
+        self.query = query
+        self.document = document
+        self.errors = errors
+        self.normalized_hash = None
+        self.dependencies = {}
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU cache of parsed and validated query documents keyed by
+    query hash.
+
+    The same entries back Automatic Persisted Queries: a client that sends
+    only a ``sha256Hash`` is served from here, and a miss asks it to resend
+    the full query.
+    """
+    def __init__(self, max_size=None):
+        self.max_size = max_size or getattr(settings, 'CRM_GRAPHQL_DOCUMENT_CACHE_SIZE', 1000)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+document_cache = DocumentCache()
@@ -0,0 +1,159 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_camel_case
+
+from .filters import OrderFilter
+from .models import Order, OrderItem
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+# Orders fetched per round trip; their items are prefetched per chunk
+EXPORT_CHUNK_SIZE = getattr(settings, 'CRM_EXPORT_CHUNK_SIZE', 2000)
+# Characters gathered before a piece of the export is handed on
+EXPORT_BUFFER_SIZE = 64 * 1024
+CSV_COLUMNS = [
+    'order_id', 'order_date', 'customer_id', 'customer_name', 'customer_email', 'total_amount',
+    'product_id', 'product_name', 'quantity', 'unit_price', 'line_total',
+]
+
+
+class InvalidExport(Exception):
+    """An export that cannot start, such as an unknown format or filter."""
+
+
+def filter_orders(params):
+    """
+    Applies ``OrderFilter`` to all orders. Arguments go by the filter's
+    names (``customer_name``, ``order_date__gte``) or by their GraphQL
+    names (``customerName``, ``orderDate_Gte``).
+    """
+    names = {to_camel_case(name): name for name in OrderFilter.base_filters}
+    data = {names.get(key, key): value for key, value in params.items()}
+    unknown = sorted(set(data) - set(OrderFilter.base_filters))
+    if unknown:
+        raise InvalidExport(f"Unknown filters: {', '.join(unknown)}.")
+
+    filterset = OrderFilter(data=data, queryset=Order.objects.all())
+    if not filterset.is_valid():
+        raise InvalidExport("; ".join(
+            f"{field}: {' '.join(messages)}" for field, messages in filterset.errors.items()
+        ))
+    queryset = filterset.qs
+    if {'product_name', 'product_id'} & set(data):
+        # Product filters join the items, repeating orders with several matches
+        queryset = Order.objects.filter(pk__in=queryset.values('pk'))
+    return queryset
+
+
+def export_queryset(queryset, chunk_size=None):
+    """
+    Iterates orders in primary-key order with their customer joined and
+    their items and products prefetched, one chunk at a time.
+
+    ``iterator()`` streams rows from a server-side cursor where the
+    backend has them and prefetches items per chunk, so memory stays
+    flat however many orders are exported.
+    """
+    items = OrderItem.objects.select_related('product').order_by('pk')
+    return (
+        queryset.select_related('customer')
+        .prefetch_related(Prefetch('items', queryset=items))
+        .order_by('pk')
+        .iterator(chunk_size=chunk_size or EXPORT_CHUNK_SIZE)
+    )
+
+
+class Echo:
+    """A file-like object whose ``write`` returns what is written, for ``csv.writer``."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    """One line per order item; orders without items get one line with no product."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for order in orders:
+        columns = [
+            order.pk, order.order_date.isoformat(), order.customer_id,
+            order.customer.name, order.customer.email, order.total_amount,
+        ]
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(columns + [''] * 5)
+        for item in items:
+            yield writer.writerow(columns + [
+                item.product_id, item.product.name, item.quantity, item.unit_price, item.line_total,
+            ])
+
+
+def ndjson_lines(orders):
+    """One JSON object per order with its items nested."""
+    for order in orders:
+        yield json.dumps({
+            'id': order.pk,
+            'orderDate': order.order_date.isoformat(),
+            'customer': {'id': order.customer_id, 'name': order.customer.name, 'email': order.customer.email},
+            'totalAmount': str(order.total_amount),
+            'items': [
+                {
+                    'productId': item.product_id,
+                    'productName': item.product.name,
+                    'quantity': item.quantity,
+                    'unitPrice': str(item.unit_price),
+                    'lineTotal': str(item.line_total),
+                }
+                for item in order.items.all()
+            ],
+        }) + '\n'
+
+
+def buffered(lines, size=EXPORT_BUFFER_SIZE):
+    """Joins lines into pieces of about ``size`` characters."""
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def aiterate(pieces):
+    """
+    Hands on the pieces of a sync export one at a time from the thread
+    that owns its database cursor. Django buffers sync iterators whole
+    when streaming under ASGI.
+    """
+    done = object()
+    pieces = iter(pieces)
+    while True:
+        piece = await sync_to_async(next, thread_sensitive=True)(pieces, done)
+        if piece is done:
+            return
+        yield piece
+
+
+def export_orders(params, format, chunk_size=None):
+    """
+    Streams the orders matching ``OrderFilter`` arguments as CSV or NDJSON.
+
+    Filters are checked before anything is read, so an invalid export
+    fails with ``InvalidExport`` up front.
+
+    Returns:
+        generator: Pieces of the export as text.
+    """
+    if format not in EXPORT_FORMATS:
+        raise InvalidExport(f"Unknown format {format!r}; use one of {', '.join(EXPORT_FORMATS)}.")
+    orders = export_queryset(filter_orders(params), chunk_size)
+    lines = csv_lines(orders) if format == 'csv' else ndjson_lines(orders)
+    return buffered(lines)
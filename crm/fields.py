@@ -0,0 +1,259 @@
+import base64
+import json
+from functools import partial
+
+import graphene
+from asgiref.sync import sync_to_async
+from django.db import connection as db_connection
+from django.db.models import Q
+from graphene.relay.connection import page_info_adapter
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
+from promise import Promise
+
+from .loaders import get_loaders, is_async_execution
+from .optimizer import optimize_queryset
+from .search import SEARCH_RANK
+
+
+# --- Connection Types ---
+def approximate_count(queryset):
+    """
+    Estimates the size of a queryset from the planner's row estimate on
+    PostgreSQL, falling back to an exact ``COUNT(*)`` elsewhere.
+    """
+    if db_connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with db_connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CountableConnection(graphene.relay.Connection):
+    """Relay connection with a ``totalCount`` that is only computed when selected."""
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int(approximate=graphene.Boolean(default_value=False))
+
+    def resolve_total_count(self, info, approximate):
+        # Offset pagination already counted the rows to slice them
+        length = getattr(self, 'length', None)
+        if length is not None:
+            return length
+        if is_async_execution(info):
+            if approximate:
+                return sync_to_async(approximate_count)(self.iterable)
+            return self.iterable.acount()
+        if approximate:
+            return approximate_count(self.iterable)
+        return self.iterable.count()
+
+
+# --- Connection Fields ---
+class CRMConnectionField(DjangoFilterConnectionField):
+    """
+    Filter connection field that plans its queryset from the client's
+    selection and queues every node of the resolved page into the
+    request's DataLoaders.
+
+    Node types opt in to batching by defining a ``queue_loaders(nodes, loaders)``
+    classmethod; their batched fields then resolve with one query per page.
+    """
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args, **kwargs):
+        queryset = super().resolve_queryset(connection, iterable, info, args, **kwargs)
+        return optimize_queryset(queryset, connection._meta.node, info)
+
+    @classmethod
+    def queue_page(cls, connection, info, resolved):
+        queue_loaders = getattr(connection._meta.node, 'queue_loaders', None)
+        if queue_loaders is not None:
+            nodes = [edge.node for edge in resolved.edges]
+            queue_loaders(nodes, get_loaders(info))
+        return resolved
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+
+        if Promise.is_thenable(result):
+            return Promise.resolve(result).then(lambda resolved: cls.queue_page(connection, info, resolved))
+        return cls.queue_page(connection, info, result)
+
+
+class KeysetConnectionField(CRMConnectionField):
+    """
+    Connection field paginated by seeking on an indexed column instead of
+    ``OFFSET``.
+
+    Nodes are ordered by ``(ordering_field, id)`` and cursors encode that
+    pair, so every page is a ``WHERE (col, id) > (...)`` range scan and
+    page N costs the same as page 1. ``totalCount`` is only counted when
+    selected and may be approximated.
+
+    Ranked search results (see ``crm.search``) are ordered and paged by
+    ``(search_rank, id)`` instead, with cursors of their own.
+    """
+    cursor_prefix = 'keyset:'
+    search_cursor_prefix = 'search:'
+
+    def __init__(self, type_, ordering_field, *args, **kwargs):
+        self.ordering_field = ordering_field
+        super().__init__(type_, *args, **kwargs)
+        # Offsets are what keyset pagination replaces
+        self._base_args.pop('offset', None)
+
+    def get_ordering_field(self, queryset):
+        if SEARCH_RANK in queryset.query.annotations:
+            return SEARCH_RANK
+        return self.ordering_field
+
+    def encode_cursor(self, node, ordering_field):
+        if ordering_field == SEARCH_RANK:
+            prefix, value = self.search_cursor_prefix, getattr(node, SEARCH_RANK)
+        else:
+            field = node._meta.get_field(ordering_field)
+            prefix, value = self.cursor_prefix, field.value_to_string(node)
+        payload = json.dumps([value, node.pk])
+        return base64.b64encode((prefix + payload).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, model, cursor, ordering_field):
+        prefix = self.search_cursor_prefix if ordering_field == SEARCH_RANK else self.cursor_prefix
+        try:
+            payload = base64.b64decode(cursor).decode('utf-8')
+            if not payload.startswith(prefix):
+                raise ValueError(cursor)
+            value, pk = json.loads(payload[len(prefix):])
+            if ordering_field == SEARCH_RANK:
+                return float(value), int(pk)
+            field = model._meta.get_field(ordering_field)
+            return field.to_python(value), int(pk)
+        except (ValueError, TypeError):
+            raise GraphQLError(f"Invalid cursor: {cursor}")
+
+    def seek(self, queryset, cursor, forward, ordering_field):
+        value, pk = self.decode_cursor(queryset.model, cursor, ordering_field)
+        lookup = 'gt' if forward else 'lt'
+        return queryset.filter(
+            Q(**{f"{ordering_field}__{lookup}": value})
+            | Q(**{ordering_field: value, f"pk__{lookup}": pk})
+        )
+
+    def get_page(self, queryset, args, max_limit):
+        """
+        Returns ``(page queryset, limit, filtered queryset)`` for the requested
+        page; the page queryset fetches one extra row to detect more pages.
+        """
+        first = args.get('first')
+        last = args.get('last')
+        after = args.get('after')
+        before = args.get('before')
+
+        ordering_field = self.get_ordering_field(queryset)
+        # The cursor columns must be loaded even if the client did not select them
+        only, defer = queryset.query.deferred_loading
+        if only and not defer and ordering_field != SEARCH_RANK:
+            queryset = queryset.only(*only, ordering_field)
+
+        filtered = queryset
+        if after:
+            queryset = self.seek(queryset, after, forward=True, ordering_field=ordering_field)
+        if before:
+            queryset = self.seek(queryset, before, forward=False, ordering_field=ordering_field)
+
+        if last is not None and first is None:
+            ordering = (f"-{ordering_field}", '-pk')
+            limit = last
+        else:
+            ordering = (ordering_field, 'pk')
+            limit = first if first is not None else max_limit
+
+        page_queryset = queryset.order_by(*ordering)
+        if limit is not None:
+            page_queryset = page_queryset[:limit + 1]
+        return page_queryset, limit, filtered
+
+    def build_connection(self, connection, nodes, limit, filtered, args):
+        after = args.get('after')
+        before = args.get('before')
+        has_more = limit is not None and len(nodes) > limit
+        nodes = nodes[:limit]
+
+        if args.get('last') is not None and args.get('first') is None:
+            nodes.reverse()
+            has_next_page, has_previous_page = bool(before), has_more
+        else:
+            has_next_page, has_previous_page = has_more, bool(after)
+
+        ordering_field = self.get_ordering_field(filtered)
+        edges = [connection.Edge(node=node, cursor=self.encode_cursor(node, ordering_field)) for node in nodes]
+        resolved = connection(
+            edges=edges,
+            page_info=page_info_adapter(
+                startCursor=edges[0].cursor if edges else None,
+                endCursor=edges[-1].cursor if edges else None,
+                hasPreviousPage=has_previous_page,
+                hasNextPage=has_next_page,
+            ),
+        )
+        resolved.iterable = filtered
+        resolved.length = None
+        return resolved
+
+    def resolve_keyset_connection(self, connection, queryset, args, max_limit):
+        page_queryset, limit, filtered = self.get_page(queryset, args, max_limit)
+        return self.build_connection(connection, list(page_queryset), limit, filtered, args)
+
+    async def aresolve_keyset_connection(self, connection, queryset, args, max_limit, info):
+        page_queryset, limit, filtered = self.get_page(queryset, args, max_limit)
+        nodes = [node async for node in page_queryset]
+        resolved = self.build_connection(connection, nodes, limit, filtered, args)
+        return self.queue_page(connection, info, resolved)
+
+    def keyset_connection_resolver(self, resolver, connection, default_manager, queryset_resolver,
+                                   max_limit, enforce_first_or_last, root, info, **args):
+        first = args.get('first')
+        last = args.get('last')
+
+        if enforce_first_or_last and not (first or last):
+            raise GraphQLError(
+                f"You must provide a `first` or `last` value to properly paginate the `{info.field_name}` connection."
+            )
+        for name, value in (('first', first), ('last', last)):
+            if value is not None and value < 0:
+                raise GraphQLError(f"Argument '{name}' must be a non-negative integer.")
+            if max_limit and value and value > max_limit:
+                raise GraphQLError(
+                    f"Requesting {value} records on the `{info.field_name}` connection "
+                    f"exceeds the `{name}` limit of {max_limit} records."
+                )
+
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = default_manager
+        queryset = queryset_resolver(connection, iterable, info, args)
+        if is_async_execution(info):
+            return self.aresolve_keyset_connection(connection, queryset, args, max_limit, info)
+        resolved = self.resolve_keyset_connection(connection, queryset, args, max_limit)
+        return self.queue_page(connection, info, resolved)
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(
+            self.keyset_connection_resolver,
+            self.resolver or parent_resolver,
+            self.connection_type,
+            self.get_manager(),
+            self.get_queryset_resolver(),
+            self.max_limit,
+            self.enforce_first_or_last,
+        )
@@ -1,6 +1,7 @@
 import django_filters
 from django_filters import rest_framework as filters
 from .models import Customer, Product, Order
+from .search import search_customers, search_orders, search_products
 
 # django-filters
 
@@ -9,6 +10,8 @@ class CustomerFilter(filters.FilterSet):
     email = filters.CharFilter(lookup_expr='icontains')
     
     phone_pattern = filters.CharFilter(method='filter_by_phone_pattern')
+    # Ranked full-text search over name and email
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Customer
@@ -17,26 +20,42 @@ class CustomerFilter(filters.FilterSet):
     def filter_by_phone_pattern(self, queryset, name, value):
         return queryset.filter(phone__startswith=value)
 
+    def filter_search(self, queryset, name, value):
+        return search_customers(queryset, value)
+
 
 class ProductFilter(filters.FilterSet):
     name = filters.CharFilter(lookup_expr='icontains')
     price = filters.RangeFilter()
     stock = filters.RangeFilter()
     low_stock = filters.NumberFilter(field_name='stock', lookup_expr='lt')
+    # Ranked full-text search over name
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Product
         fields = ['name']
 
+    def filter_search(self, queryset, name, value):
+        return search_products(queryset, value)
+
 
 class OrderFilter(filters.FilterSet):
     customer_name = filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
     product_name = filters.CharFilter(field_name='product__name', lookup_expr='icontains')
     product_id = filters.CharFilter(method='filter_by_product_id')
+    # Orders whose customer or products match, ranked
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Order
-        fields = ['total_amount', 'order_date']
+        fields = {
+            'total_amount': ['exact'],
+            'order_date': ['exact', 'gte', 'lte'],
+        }
 
     def filter_by_product_id(self, queryset, name, value):
         return queryset.filter(product__id=value)
+
+    def filter_search(self, queryset, name, value):
+        return search_orders(queryset, value)
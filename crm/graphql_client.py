@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+
+import requests
+from django.conf import settings
+from gql import Client
+from gql.transport import Transport
+from gql.transport.requests import RequestsHTTPTransport
+from graphql import execute
+from requests.adapters import HTTPAdapter
+
+DEFAULT_GRAPHQL_URL = 'http://localhost:8000/graphql'
+
+# SDL snapshot of alx_backend_graphql_crm.schema, regenerated with
+#   python manage.py graphql_schema --schema alx_backend_graphql_crm.schema.schema --out crm/schema.graphql
+SCHEMA_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.graphql')
+
+_lock = threading.Lock()
+_http_session = None
+# gql clients hold per-execution session state, so each thread gets its own
+_local = threading.local()
+
+
+class JobContext:
+    """
+    Stands in for the HttpRequest that GraphQLView passes as context, so
+    per-request state such as the DataLoaders works for in-process jobs.
+    """
+
+
+class InProcessTransport(Transport):
+    """
+    Synchronous gql transport that executes documents directly against the
+    graphene schema in this process, without HTTP or introspection.
+    """
+    def __init__(self, schema):
+        self.schema = schema
+
+    def execute(self, document, variable_values=None, operation_name=None, **kwargs):
+        return execute(
+            self.schema.graphql_schema,
+            document,
+            variable_values=variable_values,
+            operation_name=operation_name,
+            context_value=JobContext(),
+        )
+
+
+def get_http_session():
+    """Returns the process-wide pooled ``requests.Session`` for the GraphQL endpoint."""
+    global _http_session
+    with _lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            for prefix in "http://", "https://":
+                session.mount(prefix, adapter)
+            _http_session = session
+        return _http_session
+
+
+class PooledHTTPTransport(RequestsHTTPTransport):
+    """
+    RequestsHTTPTransport that borrows the shared pooled session instead of
+    opening a new one per connect, so keep-alive connections are reused
+    across executions and jobs.
+    """
+    def connect(self):
+        self.session = get_http_session()
+
+    def close(self):
+        # The pooled session outlives this transport
+        self.session = None
+
+
+def load_schema_snapshot():
+    """Returns the SDL snapshot of the schema, or None if it has not been generated."""
+    try:
+        with open(SCHEMA_SNAPSHOT) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def get_http_client():
+    """Returns a gql Client for the HTTP endpoint; usable without Django settings."""
+    url = DEFAULT_GRAPHQL_URL
+    if settings.configured:
+        url = getattr(settings, 'CRM_GRAPHQL_URL', DEFAULT_GRAPHQL_URL)
+    transport = PooledHTTPTransport(url=url)
+
+    sdl = load_schema_snapshot()
+    if sdl is None:
+        return Client(transport=transport, fetch_schema_from_transport=True)
+    return Client(transport=transport, schema=sdl, serialize_variables=True)
+
+
+def build_client(mode):
+    if mode == 'local':
+        try:
+            from alx_backend_graphql_crm.schema import schema
+        except Exception as e:
+            sys.stderr.write(f"In-process GraphQL unavailable, falling back to HTTP: {e}\n")
+        else:
+            return Client(transport=InProcessTransport(schema), schema=schema.graphql_schema)
+
+    return get_http_client()
+
+
+def get_client():
+    """
+    Returns the shared gql Client for background jobs, built once per thread.
+
+    Documents run in-process against ``alx_backend_graphql_crm.schema``
+    unless ``CRM_GRAPHQL_TRANSPORT`` is ``'http'`` or the schema cannot be
+    loaded, in which case the HTTP endpoint at ``CRM_GRAPHQL_URL`` is used
+    over a pooled session, validated against the local SDL snapshot.
+    """
+    mode = getattr(settings, 'CRM_GRAPHQL_TRANSPORT', 'local')
+    if not hasattr(_local, 'clients'):
+        _local.clients = {}
+    if mode not in _local.clients:
+        _local.clients[mode] = build_client(mode)
+    return _local.clients[mode]
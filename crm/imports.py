@@ -0,0 +1,213 @@
+import codecs
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .bulk import DEFAULT_BATCH_SIZE, format_validation_error, validate_customer
+from .models import Customer, Product
+from .response_cache import response_cache
+from .search import customer_index, product_index
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+# Extensions and content types that select a format when none is given
+FORMAT_ALIASES = {
+    'csv': 'csv',
+    'text/csv': 'csv',
+    'ndjson': 'ndjson',
+    'jsonl': 'ndjson',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+# Row errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class InvalidImport(Exception):
+    """An import that cannot start, such as an unknown kind or format."""
+
+
+def detect_format(name=None, content_type=None):
+    """Picks the format from a file name's extension or a content type."""
+    extension = os.path.splitext(name or '')[1].lstrip('.').lower()
+    format = FORMAT_ALIASES.get(extension) or FORMAT_ALIASES.get((content_type or '').lower())
+    if format is None:
+        raise InvalidImport(f"Cannot tell the format of {name or content_type!r}; use one of {', '.join(IMPORT_FORMATS)}.")
+    return format
+
+
+def read_rows(lines, format):
+    """
+    Parses an iterable of byte lines one line at a time.
+
+    Yields:
+        tuple: (line number, dict of values or None, error message or None)
+    """
+    text = codecs.iterdecode(lines, 'utf-8-sig')
+    if format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "More values than columns."
+                continue
+            yield reader.line_num, {key.strip(): value.strip() for key, value in row.items() if value is not None}, None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, None, "Expected a JSON object."
+            continue
+        yield line_number, data, None
+
+
+def validate_product(data):
+    """
+    Builds an unsaved Product from input data with the rules of
+    ``CreateProduct``: a positive price and a non-negative stock.
+    """
+    sku = str(data.get('sku') or '').strip()
+    if not sku:
+        raise ValidationError({'sku': ["This field is required to match existing products."]})
+    stock = data.get('stock')
+    product = Product(
+        sku=sku,
+        name=data.get('name'),
+        price=data.get('price'),
+        stock=0 if stock in (None, '') else stock,
+    )
+    product.clean_fields(exclude=['created_at', 'updated_at'])
+    if product.price <= 0:
+        raise ValidationError({'price': ["Price must be a positive number."]})
+    if product.stock < 0:
+        raise ValidationError({'stock': ["Stock cannot be a negative number."]})
+    return product
+
+
+class ImportReport:
+    """Counts rows as they are imported and keeps the first row errors."""
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Line {line_number}: {message}")
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'errorCount': self.error_count,
+            'errors': self.errors,
+        }
+
+
+class Importer:
+    """
+    Upserts rows of one model on a natural key.
+
+    Rows are validated as they are read and written in chunks with one
+    ``bulk_create(update_conflicts=True)`` each, so only a chunk is held
+    in memory. Each chunk commits on its own: a failure stops the import
+    with the earlier chunks kept.
+    """
+    def __init__(self, model, key, fields, validate, index):
+        self.model = model
+        self.key = key
+        self.fields = fields
+        self.validate = validate
+        self.index = index
+
+    @property
+    def permissions(self):
+        """Upserts both add and change rows."""
+        opts = self.model._meta
+        return [f"{opts.app_label}.add_{opts.model_name}", f"{opts.app_label}.change_{opts.model_name}"]
+
+    def upsert(self, objs):
+        # Later rows for the same key win, as if upserted one at a time
+        objs = list({getattr(obj, self.key): obj for obj in objs}.values())
+        with transaction.atomic():
+            saved = self.model.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=[self.key],
+                update_fields=[*self.fields, 'updated_at'],
+            )
+            if any(obj.pk is None for obj in saved):
+                # Backends without RETURNING leave the primary keys unset
+                pks = dict(
+                    self.model.objects.filter(**{f"{self.key}__in": [getattr(obj, self.key) for obj in saved]})
+                    .values_list(self.key, 'pk')
+                )
+                for obj in saved:
+                    obj.pk = pks[getattr(obj, self.key)]
+            # bulk_create does not send post_save
+            self.index.update(saved)
+            response_cache.invalidate(self.model._meta.model_name)
+        return len(saved)
+
+    def run(self, lines, format, batch_size=None, progress=None):
+        """
+        Imports the rows of a CSV or NDJSON stream of byte lines.
+
+        Args:
+            lines: An iterable of byte lines, such as an open binary file.
+            format (str): ``csv`` or ``ndjson``.
+            batch_size (int): Rows per upsert.
+            progress (callable): Called with the report after every chunk.
+
+        Returns:
+            ImportReport: The row counts and per-row errors.
+        """
+        if format not in IMPORT_FORMATS:
+            raise InvalidImport(f"Unknown format {format!r}; use one of {', '.join(IMPORT_FORMATS)}.")
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        report = ImportReport()
+        rows = read_rows(lines, format)
+        while True:
+            chunk = []
+            read = 0
+            for line_number, data, error in islice(rows, batch_size):
+                read += 1
+                if error is None:
+                    try:
+                        chunk.append(self.validate(data))
+                        continue
+                    except ValidationError as e:
+                        error = format_validation_error(e)
+                report.add_error(line_number, error)
+            if not read:
+                break
+            report.rows += read
+            if chunk:
+                report.imported += self.upsert(chunk)
+            if progress:
+                progress(report)
+        return report
+
+
+IMPORTERS = {
+    'customers': Importer(Customer, 'email', ['name', 'phone'], validate_customer, customer_index),
+    'products': Importer(Product, 'sku', ['name', 'price', 'stock'], validate_product, product_index),
+}
+
+
+def get_importer(kind):
+    try:
+        return IMPORTERS[kind]
+    except KeyError:
+        raise InvalidImport(f"Unknown import {kind!r}; use one of {', '.join(IMPORTERS)}.")
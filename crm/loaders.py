@@ -0,0 +1,162 @@
+import asyncio
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from .models import Customer, CustomerSummary, OrderItem, Product
+
+
+# --- Batching DataLoader ---
+class DataLoader:
+    """
+    Per-request loader that batches lookups by key.
+
+    Keys are queued with ``enqueue`` (typically for every node on a
+    connection page) and fetched together the first time any of them is
+    loaded, so resolving a field for a whole page costs one query.
+
+    Attributes:
+        batch_load_fn (callable): Takes a list of keys and returns a dict
+            mapping each found key to its value.
+        default (callable): Factory for the value of keys that were not found.
+    """
+    def __init__(self, batch_load_fn, default=lambda: None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._queue = []
+        self._lock = asyncio.Lock()
+
+    def enqueue(self, keys):
+        """Queues keys to be fetched with the next batch."""
+        self._queue.extend(key for key in keys if key not in self._cache)
+
+    def prime(self, key, value):
+        """Stores an already-known value so it is never fetched."""
+        self._cache.setdefault(key, value)
+
+    def take_queue(self):
+        """Removes and returns the queued keys that still have to be fetched."""
+        keys = list(dict.fromkeys(key for key in self._queue if key not in self._cache))
+        self._queue = []
+        return keys
+
+    def store(self, keys, results):
+        for key in keys:
+            self._cache[key] = results[key] if key in results else self.default()
+
+    def dispatch(self):
+        """Fetches every queued key in a single call to ``batch_load_fn``."""
+        keys = self.take_queue()
+        if keys:
+            self.store(keys, self.batch_load_fn(keys))
+
+    async def adispatch(self):
+        """Like ``dispatch``, but runs ``batch_load_fn`` off the event loop."""
+        keys = self.take_queue()
+        if keys:
+            self.store(keys, await sync_to_async(self.batch_load_fn)(keys))
+
+    def load(self, key):
+        if key not in self._cache:
+            self.enqueue([key])
+            self.dispatch()
+        return self._cache[key]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        self.enqueue(keys)
+        self.dispatch()
+        return [self._cache[key] for key in keys]
+
+    async def aload(self, key):
+        if key not in self._cache:
+            self.enqueue([key])
+            # Sibling resolvers wait for the batch in flight instead of
+            # fetching their keys one by one
+            async with self._lock:
+                if key not in self._cache:
+                    # Batch functions may enqueue from a worker thread
+                    self.enqueue([key])
+                    await self.adispatch()
+        return self._cache[key]
+
+
+# --- Batch Load Functions ---
+def load_customers(keys):
+    return Customer.objects.in_bulk(keys)
+
+
+def load_customer_summaries(keys):
+    """Loads summaries by customer ID, their primary key."""
+    return CustomerSummary.objects.in_bulk(keys)
+
+
+def load_products(keys):
+    return Product.objects.in_bulk(keys)
+
+
+def load_products_by_order(keys):
+    """Loads the products of each order through its ``OrderItem`` rows."""
+    products = defaultdict(list)
+    rows = (
+        OrderItem.objects
+        .filter(order_id__in=keys)
+        .select_related('product')
+        .order_by('id')
+    )
+    for row in rows:
+        products[row.order_id].append(row.product)
+    return products
+
+
+def load_items_by_order(keys):
+    """Loads the line items of each order from ``OrderItem`` alone."""
+    items = defaultdict(list)
+    for item in OrderItem.objects.filter(order_id__in=keys).order_by('id'):
+        items[item.order_id].append(item)
+    return items
+
+
+class Loaders:
+    """The set of DataLoaders shared by all resolvers of one request."""
+    def __init__(self):
+        self.customer = DataLoader(self.load_customers)
+        self.customer_summary = DataLoader(load_customer_summaries)
+        self.product = DataLoader(load_products)
+        self.products_by_order = DataLoader(load_products_by_order, default=list)
+        self.items_by_order = DataLoader(self.load_items_by_order, default=list)
+
+    def load_customers(self, keys):
+        customers = load_customers(keys)
+        # Summaries of every loaded customer are fetched together if selected
+        self.customer_summary.enqueue(customers)
+        return customers
+
+    def load_items_by_order(self, keys):
+        items = load_items_by_order(keys)
+        # Products of every loaded item are fetched together if selected
+        self.product.enqueue(item.product_id for order_items in items.values() for item in order_items)
+        return items
+
+
+def is_async_execution(info):
+    """
+    Whether the request is executed by the async view, whose resolvers must
+    return awaitables instead of querying the database from the event loop.
+    """
+    return getattr(info.context, 'async_execution', False)
+
+
+def get_loaders(info):
+    """
+    Returns the loaders attached to the GraphQL context, creating them on
+    first use so every resolver in the request shares the same cache.
+    """
+    context = info.context
+    loaders = getattr(context, 'loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        if context is not None:
+            context.loaders = loaders
+    return loaders
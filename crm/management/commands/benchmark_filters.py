@@ -0,0 +1,87 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from crm.filters import CustomerFilter, ProductFilter, OrderFilter
+from crm.models import Customer, Product, Order
+from crm.synthetic import top_up_tables
+
+
+def filter_cases():
+    """The crm/filters.py hot paths, each as (label, model, queryset factory)."""
+    week_ago = timezone.now() - timedelta(days=7)
+    return [
+        ("orders by order_date range", Order, lambda: (
+            Order.objects.filter(order_date__gte=week_ago).order_by('order_date', 'id')[:100]
+        )),
+        ("orders by total_amount", Order, lambda: (
+            OrderFilter(data={'total_amount': '150.00'}, queryset=Order.objects.all()).qs[:100]
+        )),
+        ("products by price range", Product, lambda: (
+            ProductFilter(data={'price_min': '10', 'price_max': '12'}, queryset=Product.objects.all()).qs[:100]
+        )),
+        ("products by stock range", Product, lambda: (
+            ProductFilter(data={'stock_min': '20', 'stock_max': '21'}, queryset=Product.objects.all()).qs[:100]
+        )),
+        ("products with low stock", Product, lambda: (
+            ProductFilter(data={'low_stock': '5'}, queryset=Product.objects.all()).qs[:100]
+        )),
+        ("customers by phone prefix", Customer, lambda: (
+            CustomerFilter(data={'phone_pattern': '+1555'}, queryset=Customer.objects.all()).qs[:100]
+        )),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares query plans and timings of the crm/filters.py hot paths "
+        "with and without the filter indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help="Orders to benchmark against; customers and products get a tenth each.")
+        parser.add_argument('--seed', action='store_true',
+                            help="Insert synthetic rows until the tables reach --rows.")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed runs per query; the median is reported.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            top_up_tables(options['rows'], log=self.stdout.write)
+
+        self.stdout.write(
+            f"Benchmarking against {Order.objects.count()} orders, "
+            f"{Product.objects.count()} products, {Customer.objects.count()} customers.\n"
+        )
+        for label, model, make_queryset in filter_cases():
+            without_index = self.measure(make_queryset, options['repeat'], drop_indexes=model._meta.indexes)
+            with_index = self.measure(make_queryset, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f"  without indexes: {without_index[0]:.2f} ms")
+            self.stdout.write(f"    {without_index[1]}")
+            self.stdout.write(f"  with indexes:    {with_index[0]:.2f} ms")
+            self.stdout.write(f"    {with_index[1]}")
+
+    def measure(self, make_queryset, repeat, drop_indexes=()):
+        """Returns (median ms, query plan), optionally with indexes dropped for the run."""
+        with transaction.atomic():
+            # DDL is transactional on SQLite and PostgreSQL, so the rollback restores them
+            with connection.cursor() as cursor:
+                for index in drop_indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+            plan = make_queryset().explain().replace("\n", "\n    ")
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(make_queryset())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            transaction.set_rollback(True)
+        return statistics.median(timings), plan
@@ -0,0 +1,293 @@
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from alx_backend_graphql_crm.schema import schema
+from crm.models import Customer, Product, Order
+from crm.synthetic import top_up_tables
+
+ALL_ORDERS = """
+query AllOrders($first: Int) {
+  allOrders(first: $first) {
+    edges {
+      node {
+        id
+        totalAmount
+        orderDate
+        customer { name email }
+        products { name price }
+      }
+    }
+  }
+}
+"""
+
+FILTERED_PRODUCTS = """
+query FilteredProducts($first: Int, $name: String, $lowStock: Decimal) {
+  allProducts(first: $first, name: $name, lowStock: $lowStock) {
+    edges { node { id name price stock } }
+  }
+}
+"""
+
+CREATE_CUSTOMER = """
+mutation CreateCustomer($input: CustomerInput!) {
+  createCustomer(input: $input) {
+    customer { id name email phone }
+    message
+  }
+}
+"""
+
+BULK_CREATE_CUSTOMERS = """
+mutation BulkCreateCustomers($input: [CustomerInput]!) {
+  bulkCreateCustomers(input: $input) {
+    customers { id }
+    errors
+  }
+}
+"""
+
+CREATE_PRODUCT = """
+mutation CreateProduct($input: ProductInput!) {
+  createProduct(input: $input) {
+    product { id name price stock }
+  }
+}
+"""
+
+CREATE_ORDER = """
+mutation CreateOrder($input: OrderInput!) {
+  createOrder(input: $input) {
+    order {
+      id
+      customer { name }
+      products { name price }
+      totalAmount
+      orderDate
+    }
+  }
+}
+"""
+
+
+class BenchmarkCase:
+    """
+    A document and its variables, run ``repeat`` times. Mutations run in a
+    transaction that is rolled back, so every run sees the same data.
+    """
+    def __init__(self, name, document, variables=None, mutation=False, repeat=None):
+        self.name = name
+        self.document = document
+        self.variables = variables or (lambda: {})
+        self.mutation = mutation
+        self.repeat = repeat
+
+
+def benchmark_cases(bulk_size):
+    """The representative documents: the seed_db.py mutations and the hot read paths."""
+    def first_customer_and_products():
+        customer = Customer.objects.order_by('pk').values_list('pk', flat=True).first()
+        # In stock, so the order is placed rather than rejected
+        products = list(Product.objects.filter(stock__gte=1).order_by('pk').values_list('pk', flat=True)[:2])
+        return {'input': {'customerId': customer, 'productIds': products}}
+
+    return [
+        BenchmarkCase("allOrders first 20 with customer and products", ALL_ORDERS, lambda: {'first': 20}),
+        BenchmarkCase("allOrders first 100 with customer and products", ALL_ORDERS, lambda: {'first': 100}),
+        BenchmarkCase("allProducts filtered by name and low stock", FILTERED_PRODUCTS,
+                      lambda: {'first': 50, 'name': "Pro", 'lowStock': 50}),
+        BenchmarkCase("createCustomer", CREATE_CUSTOMER, lambda: {
+            'input': {'name': "Alice", 'email': "benchmark-alice@example.com", 'phone': "+1234567890"},
+        }, mutation=True),
+        BenchmarkCase("bulkCreateCustomers of 2", BULK_CREATE_CUSTOMERS, lambda: {'input': [
+            {'name': "Bob", 'email': "benchmark-bob@example.com", 'phone': "123-456-7890"},
+            {'name': "Carol", 'email': "benchmark-carol@example.com"},
+        ]}, mutation=True),
+        BenchmarkCase(f"bulkCreateCustomers of {bulk_size}", BULK_CREATE_CUSTOMERS, lambda: {'input': [
+            {'name': f"Bulk {i}", 'email': f"benchmark-bulk-{i}@example.com"} for i in range(bulk_size)
+        ]}, mutation=True, repeat=3),
+        BenchmarkCase("createProduct", CREATE_PRODUCT, lambda: {
+            'input': {'name': "Laptop", 'price': 999.99, 'stock': 10},
+        }, mutation=True),
+        BenchmarkCase("createOrder", CREATE_ORDER, first_customer_and_products, mutation=True),
+    ]
+
+
+def percentile_summary(values):
+    cuts = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return {
+        'min': min(values),
+        'mean': statistics.fmean(values),
+        'p50': cuts[49],
+        'p95': cuts[94],
+        'p99': cuts[98],
+        'max': max(values),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs representative GraphQL documents against the schema and reports "
+        "latency percentiles, SQL query counts and memory, optionally saving "
+        "JSON results and comparing them with a previous run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true',
+                            help="Top the tables up with synthetic rows first.")
+        parser.add_argument('--rows', type=int, default=10_000,
+                            help="Orders to seed; customers and products get a tenth each.")
+        parser.add_argument('--repeat', type=int, default=20,
+                            help="Timed runs per document.")
+        parser.add_argument('--warmup', type=int, default=2,
+                            help="Untimed runs per document before measuring.")
+        parser.add_argument('--bulk-size', type=int, default=10_000,
+                            help="Customers in the large bulkCreateCustomers document.")
+        parser.add_argument('--only', default=None,
+                            help="Run only documents whose name contains this text.")
+        parser.add_argument('--output', default=None,
+                            help="Write the results as JSON to this path.")
+        parser.add_argument('--compare', default=None,
+                            help="JSON results of an earlier run to compare p50 latencies with.")
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help="Percent p50 slowdown reported as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help="Exit with an error if any document regressed.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            top_up_tables(options['rows'], log=self.stdout.write)
+        if not (Customer.objects.exists() and Product.objects.exists()):
+            raise CommandError("No data to benchmark against; run with --seed or generate_data first.")
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'rows': {
+                    'customers': Customer.objects.count(),
+                    'products': Product.objects.count(),
+                    'orders': Order.objects.count(),
+                },
+            },
+            'cases': {},
+        }
+
+        for case in benchmark_cases(options['bulk_size']):
+            if options['only'] and options['only'] not in case.name:
+                continue
+            stats = self.run_case(case, case.repeat or options['repeat'], options['warmup'])
+            results['cases'][case.name] = stats
+            latency = stats['latency_ms']
+            self.stdout.write(self.style.MIGRATE_HEADING(case.name))
+            self.stdout.write(
+                f"  p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms, "
+                f"{stats['sql_queries']} queries, {stats['peak_memory_kib']:.0f} KiB peak"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"\nResults written to {options['output']}")
+
+        if options['compare']:
+            regressions = self.compare(results, options['compare'], options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} document(s) regressed: {', '.join(regressions)}")
+
+    def execute_case(self, case, variables):
+        context = RequestFactory().post('/graphql')
+        with transaction.atomic():
+            result = schema.execute(case.document, variable_values=variables, context_value=context)
+            if case.mutation:
+                transaction.set_rollback(True)
+        if result.errors:
+            raise CommandError(f"{case.name} failed: {result.errors[0]}")
+
+    def run_case(self, case, repeat, warmup):
+        """Returns latency percentiles, the SQL query count and peak memory of a document."""
+        variables = case.variables()
+        for _ in range(warmup):
+            self.execute_case(case, variables)
+
+        timings = []
+        queries = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                self.execute_case(case, variables)
+                timings.append((time.perf_counter() - start) * 1000)
+            # Transaction control statements are not the document's queries
+            queries.append(sum(
+                1 for query in captured.captured_queries
+                if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+            ))
+        reset_queries()
+
+        # Tracing allocations slows execution down, so memory gets a run of its own
+        tracemalloc.start()
+        try:
+            self.execute_case(case, variables)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'runs': repeat,
+            'latency_ms': percentile_summary(timings),
+            'sql_queries': statistics.median_low(queries),
+            'peak_memory_kib': peak / 1024,
+        }
+
+    def compare(self, results, path, threshold):
+        """Prints p50 changes against an earlier run and returns the regressed documents."""
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nCompared with {baseline['meta'].get('commit') or path}"
+        ))
+        regressions = []
+        for name, stats in results['cases'].items():
+            before = baseline['cases'].get(name)
+            if before is None:
+                self.stdout.write(f"  {name}: new")
+                continue
+            old, new = before['latency_ms']['p50'], stats['latency_ms']['p50']
+            change = (new - old) / old * 100 if old else 0.0
+            line = (
+                f"  {name}: p50 {old:.2f} -> {new:.2f} ms ({change:+.1f}%), "
+                f"queries {before['sql_queries']} -> {stats['sql_queries']}"
+            )
+            if change > threshold or stats['sql_queries'] > before['sql_queries']:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
@@ -0,0 +1,73 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from crm.filters import CustomerFilter, ProductFilter, OrderFilter
+from crm.models import Customer, Product, Order
+from crm.synthetic import top_up_tables
+
+
+def search_cases(term):
+    """
+    Pairs of (label, icontains queryset factory, search queryset factory),
+    each fetching the first page the way the connections order it.
+    """
+    def page(filterset_class, model, data, ordering):
+        return lambda: filterset_class(data=data, queryset=model.objects.all()).qs.order_by(*ordering)[:100]
+
+    return [
+        ("customers by name",
+         page(CustomerFilter, Customer, {'name': term}, ('created_at', 'id')),
+         page(CustomerFilter, Customer, {'search': term}, ('search_rank', 'id'))),
+        ("products by name",
+         page(ProductFilter, Product, {'name': term}, ('created_at', 'id')),
+         page(ProductFilter, Product, {'search': term}, ('search_rank', 'id'))),
+        ("orders by customer name",
+         page(OrderFilter, Order, {'customer_name': term}, ('order_date', 'id')),
+         page(OrderFilter, Order, {'search': term}, ('search_rank', 'id'))),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the latency of the icontains name filters with the ranked "
+        "full-text search argument of allCustomers, allProducts and allOrders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help="Orders to benchmark against; customers and products get a tenth each.")
+        parser.add_argument('--seed', action='store_true',
+                            help="Insert synthetic rows until the tables reach --rows, then rebuild the search index.")
+        parser.add_argument('--term', default='4242',
+                            help="Text to look for; synthetic rows are named after their number.")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed runs per query; the median is reported.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            top_up_tables(options['rows'], log=self.stdout.write)
+
+        self.stdout.write(
+            f"Searching for {options['term']!r} in {Order.objects.count()} orders, "
+            f"{Product.objects.count()} products, {Customer.objects.count()} customers "
+            f"on {connection.vendor}.\n"
+        )
+        for label, make_icontains, make_search in search_cases(options['term']):
+            icontains = self.measure(make_icontains, options['repeat'])
+            search = self.measure(make_search, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f"  icontains: {icontains[0]:.2f} ms, {icontains[1]} rows")
+            self.stdout.write(f"  search:    {search[0]:.2f} ms, {search[1]} rows")
+
+    def measure(self, make_queryset, repeat):
+        """Returns (median ms, rows on the page)."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rows = len(list(make_queryset()))
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), rows
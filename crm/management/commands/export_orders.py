@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.exports import EXPORT_FORMATS, InvalidExport, export_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams orders with their customer and items as CSV or NDJSON, "
+        "filtered with the same arguments as allOrders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv',
+                            help="The output format.")
+        parser.add_argument('--output', default=None,
+                            help="The file to write; standard output by default.")
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help="An OrderFilter argument, e.g. customer_name=Alice or orderDate_Gte=2025-01-01. Repeatable.")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help="Orders fetched per round trip.")
+
+    def handle(self, *args, **options):
+        params = {}
+        for argument in options['filter']:
+            name, separator, value = argument.partition('=')
+            if not separator:
+                raise CommandError(f"Filters take the form NAME=VALUE, not {argument!r}.")
+            params[name] = value
+
+        try:
+            pieces = export_orders(params, options['format'], options['chunk_size'])
+        except InvalidExport as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                for piece in pieces:
+                    f.write(piece)
+        else:
+            for piece in pieces:
+                self.stdout.write(piece, ending='')
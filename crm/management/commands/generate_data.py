@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.bulk import rebuild_customer_summaries
+from crm.models import Customer, Product
+from crm.search import SEARCH_INDEXES
+from crm.synthetic import generate_customers, generate_orders, generate_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates synthetic customers, products and orders at production "
+        "volume for benchmarking, with chunked bulk_create and optional worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1_000_000,
+                            help="Orders to create.")
+        parser.add_argument('--customers', type=int, default=None,
+                            help="Customers to create; defaults to a tenth of --orders.")
+        parser.add_argument('--products', type=int, default=None,
+                            help="Products to create; defaults to a hundredth of --orders.")
+        parser.add_argument('--batch-size', type=int, default=10_000,
+                            help="Rows per bulk_create.")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes generating and inserting chunks of orders.")
+        parser.add_argument('--days', type=int, default=730,
+                            help="Spread order dates over this many past days.")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Random seed for reproducible data.")
+
+    def handle(self, *args, **options):
+        orders = options['orders']
+        customers = options['customers'] if options['customers'] is not None else max(orders // 10, 1)
+        products = options['products'] if options['products'] is not None else max(orders // 100, 1)
+        batch_size = options['batch_size']
+        seed = options['seed']
+
+        def log(message):
+            self.stdout.write(f"  {message}", ending='\r')
+            self.stdout.flush()
+
+        start = time.perf_counter()
+        self.step("customers", lambda: generate_customers(customers, batch_size, seed, log=log))
+        self.step("products", lambda: generate_products(products, batch_size, seed, log=log))
+        if orders and not (Customer.objects.exists() and Product.objects.exists()):
+            raise CommandError("Orders need at least one customer and one product.")
+        self.step("orders", lambda: generate_orders(
+            orders, batch_size, options['workers'], seed, options['days'], log=log
+        ))
+
+        # Generated rows bypass the signals and create_orders
+        self.step("search index", lambda: [index.rebuild() for index in SEARCH_INDEXES])
+        self.step("customer summaries", rebuild_customer_summaries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {customers} customers, {products} products and {orders} orders "
+            f"in {time.perf_counter() - start:.1f}s."
+        ))
+
+    def step(self, label, run):
+        start = time.perf_counter()
+        run()
+        self.stdout.write(f"{label}: {time.perf_counter() - start:.1f}s" + " " * 40)
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.imports import IMPORT_FORMATS, IMPORTERS, InvalidImport, detect_format, get_importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams customers or products from a CSV or NDJSON file and upserts "
+        "them in chunks, matching customers by email and products by SKU."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(IMPORTERS),
+                            help="What the file holds.")
+        parser.add_argument('path',
+                            help="The file to import, or - to read standard input.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, default=None,
+                            help="The file format; taken from the extension by default.")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per upsert.")
+
+    def handle(self, *args, **options):
+        importer = get_importer(options['kind'])
+
+        def progress(report):
+            self.stdout.write(f"Read {report.rows} rows: {report.imported} imported, {report.error_count} errors")
+
+        try:
+            format = options['format'] or detect_format(options['path'])
+            if options['path'] == '-':
+                report = importer.run(sys.stdin.buffer, format, options['batch_size'], progress)
+            else:
+                with open(options['path'], 'rb') as lines:
+                    report = importer.run(lines, format, options['batch_size'], progress)
+        except (InvalidImport, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stderr.write(error)
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... and {report.error_count - len(report.errors)} more errors")
+
+        message = f"Imported {report.imported} of {report.rows} {options['kind']}"
+        if report.error_count:
+            self.stdout.write(self.style.WARNING(f"{message}; {report.error_count} rows had errors."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{message}."))
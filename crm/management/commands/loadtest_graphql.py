@@ -0,0 +1,208 @@
+import asyncio
+import io
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+DEFAULT_QUERY = """
+query LoadTest {
+  allOrders(first: 20) {
+    edges {
+      node {
+        totalAmount
+        orderDate
+        customer { name email }
+        products { name price }
+      }
+    }
+  }
+}
+"""
+
+
+def wsgi_request(application, path, body):
+    """Sends one POST through a WSGI application and returns the status code."""
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(status[0].split()[0])
+
+
+async def asgi_request(application, path, body):
+    """Sends one POST through an ASGI application and returns the status code."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'POST',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': b'',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    finished = asyncio.Event()
+    status = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    try:
+        await application(scope, receive, send)
+    finally:
+        finished.set()
+    return status[0]
+
+
+def summarize(results, elapsed):
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, status in results if status != 200),
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'p50': cuts[49],
+        'p95': cuts[94],
+        'p99': cuts[98],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares GraphQL throughput of the sync view on the WSGI application "
+        "with the async view on the ASGI application under concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Requests sent to each application.")
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help="Requests in flight at any time.")
+        parser.add_argument('--threads', type=int, default=4,
+                            help="WSGI worker threads serving the in-flight requests.")
+        parser.add_argument('--db-latency', type=float, default=0.0,
+                            help="Milliseconds added to every SQL query to model a slow database.")
+        parser.add_argument('--query', default=DEFAULT_QUERY,
+                            help="GraphQL document to send; defaults to a page of orders.")
+
+    def handle(self, *args, **options):
+        body = json.dumps({'query': options['query']}).encode('utf-8')
+
+        latency = options['db_latency'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # Fired on every reconnect of a thread's connection wrapper
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        if latency:
+            connection_created.connect(install)
+            install(None, connection)
+        try:
+            from alx_backend_graphql_crm.wsgi import application as wsgi_application
+            from alx_backend_graphql_crm.asgi import application as asgi_application
+
+            wsgi = self.run_wsgi(wsgi_application, body, options)
+            asgi = asyncio.run(self.run_asgi(asgi_application, body, options))
+        finally:
+            if latency:
+                connection_created.disconnect(install)
+                connection.execute_wrappers.remove(slow_query)
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} in flight, "
+            f"{options['db_latency']:g} ms added per SQL query\n"
+        )
+        for label, stats in (
+            (f"WSGI /graphql ({options['threads']} threads)", wsgi),
+            ("ASGI /graphql/async (event loop)", asgi),
+        ):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(
+                f"  {stats['throughput']:.1f} req/s, p50 {stats['p50']:.1f} ms, "
+                f"p95 {stats['p95']:.1f} ms, p99 {stats['p99']:.1f} ms, "
+                f"{stats['errors']} errors"
+            )
+
+    def run_wsgi(self, application, body, options):
+        """Queues requests for a fixed pool of threads, like a threaded WSGI server."""
+        slots = threading.BoundedSemaphore(options['concurrency'])
+
+        def call(submitted):
+            try:
+                status = wsgi_request(application, '/graphql', body)
+            finally:
+                slots.release()
+            return time.perf_counter() - submitted, status
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            start = time.perf_counter()
+            futures = []
+            for _ in range(options['requests']):
+                slots.acquire()
+                futures.append(pool.submit(call, time.perf_counter()))
+            results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - start
+        return summarize(results, elapsed)
+
+    async def run_asgi(self, application, body, options):
+        """Keeps requests in flight on one event loop, like an ASGI server."""
+        slots = asyncio.Semaphore(options['concurrency'])
+
+        async def call():
+            async with slots:
+                submitted = time.perf_counter()
+                status = await asgi_request(application, '/graphql/async', body)
+                return time.perf_counter() - submitted, status
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(call() for _ in range(options['requests'])))
+        return summarize(results, time.perf_counter() - start)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from crm.bulk import rebuild_customer_summaries
+
+
+class Command(BaseCommand):
+    help = "Recomputes the order count, lifetime value and last order date of every customer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Customers aggregated and replaced per transaction.")
+
+    def handle(self, *args, **options):
+        summarized = rebuild_customer_summaries(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt summaries of {summarized} customers with orders."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from crm.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = (
+        "Recopies customers and products into their SQLite FTS5 search tables, "
+        "e.g. after rows were written with bulk_create or raw SQL."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Nothing to rebuild: {connection.vendor} search indexes are maintained by the database.")
+            return
+
+        with transaction.atomic():
+            for index in SEARCH_INDEXES:
+                index.rebuild()
+                self.stdout.write(f"Rebuilt {index.table} from {index.model.objects.count()} rows")
@@ -0,0 +1,127 @@
+import itertools
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from crm.bulk import create_orders
+from crm.models import Customer, Product
+
+MAX_RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Places bursts of concurrent orders against a few low-stock products "
+        "and checks that stock reservation never oversells."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500,
+                            help="Orders placed in total.")
+        parser.add_argument('--threads', type=int, default=8,
+                            help="Threads placing orders at the same time.")
+        parser.add_argument('--products', type=int, default=3,
+                            help="Products the orders compete for.")
+        parser.add_argument('--stock', type=int, default=100,
+                            help="Starting stock of each product.")
+        parser.add_argument('--quantity', type=int, default=1,
+                            help="Units of each product per order.")
+
+    def handle(self, *args, **options):
+        customer = Customer.objects.create(
+            name="Stress Test", email=f"stress-{time.time_ns()}@example.com"
+        )
+        products = [
+            Product.objects.create(name=f"Stress product {i}", price=1, stock=options['stock'])
+            for i in range(options['products'])
+        ]
+        try:
+            stats = self.run(customer, products, options)
+            remaining = dict(
+                Product.objects.filter(pk__in=[p.pk for p in products]).values_list('pk', 'stock')
+            )
+        finally:
+            # Cascades to the orders and their items
+            Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+            customer.delete()
+
+        for product in products:
+            sold = stats['sold'].get(product.pk, 0)
+            if remaining[product.pk] < 0 or remaining[product.pk] != options['stock'] - sold:
+                raise CommandError(
+                    f"Product {product.pk}: sold {sold} of {options['stock']} "
+                    f"but {remaining[product.pk]} left in stock"
+                )
+
+        self.stdout.write(
+            f"{stats['attempts']} orders from {options['threads']} threads in "
+            f"{stats['elapsed']:.2f}s ({stats['attempts'] / stats['elapsed']:.1f} orders/s)"
+        )
+        self.stdout.write(
+            f"  {stats['placed']} placed, {stats['rejected']} rejected for stock, "
+            f"{stats['retries']} lock retries, {stats['failed']} failed"
+        )
+        self.stdout.write(self.style.SUCCESS("Stock matches the placed orders; nothing was oversold."))
+
+    def run(self, customer, products, options):
+        lock = threading.Lock()
+        stats = {'attempts': 0, 'placed': 0, 'rejected': 0, 'retries': 0, 'failed': 0, 'sold': {}}
+        cycle = itertools.cycle(products)
+        indexes = iter(range(options['orders']))
+
+        def place(index):
+            # Orders take one or two products so their reservations overlap
+            with lock:
+                lines = [next(cycle) for _ in range(1 + index % 2)]
+            data = {
+                'customerId': customer.pk,
+                'items': [{'productId': p.pk, 'quantity': options['quantity']} for p in lines],
+            }
+            retries = 0
+            try:
+                while True:
+                    try:
+                        [(order, items, error)] = create_orders([data])
+                        break
+                    except OperationalError:
+                        # SQLite allows one writer; others may be turned away
+                        retries += 1
+                        if retries > MAX_RETRIES:
+                            raise
+                        time.sleep(0.001 * retries)
+            except Exception:
+                order, items, error = None, None, 'failed'
+
+            with lock:
+                stats['attempts'] += 1
+                stats['retries'] += retries
+                if order is not None:
+                    stats['placed'] += 1
+                    for item in items:
+                        stats['sold'][item.product_id] = stats['sold'].get(item.product_id, 0) + item.quantity
+                elif error == 'failed':
+                    stats['failed'] += 1
+                else:
+                    stats['rejected'] += 1
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        index = next(indexes, None)
+                    if index is None:
+                        return
+                    place(index)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats['elapsed'] = time.perf_counter() - start
+        return stats
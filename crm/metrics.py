@@ -0,0 +1,230 @@
+import datetime
+import functools
+import threading
+import time
+from inspect import isawaitable
+
+from django.db import connection
+from graphql import get_named_type, is_leaf_type
+
+JOB_METRICS_LOG = "/tmp/crm_job_metrics_log.txt"
+
+
+class JobMetrics:
+    """
+    Thread-safe registry of execution timings for background jobs.
+
+    Each job name maps to its run count, failure count, and last, total and
+    maximum duration in seconds.
+    """
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, failed=False):
+        with self._lock:
+            job = self._jobs.setdefault(name, {
+                'runs': 0, 'failures': 0, 'last_seconds': 0.0,
+                'total_seconds': 0.0, 'max_seconds': 0.0,
+            })
+            job['runs'] += 1
+            job['failures'] += int(failed)
+            job['last_seconds'] = seconds
+            job['total_seconds'] += seconds
+            job['max_seconds'] = max(job['max_seconds'], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(job) for name, job in self._jobs.items()}
+
+
+job_metrics = JobMetrics()
+
+
+def timed_job(func):
+    """
+    Records the wall time of every run of a job in ``job_metrics`` and
+    appends it to the job metrics log, which outlives short cron processes.
+    """
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            job_metrics.record(name, seconds, failed=failed)
+            try:
+                with open(JOB_METRICS_LOG, "a") as f:
+                    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    status = "FAILED" if failed else "OK"
+                    f.write(f"{timestamp} {name} {status} {seconds * 1000:.1f}ms\n")
+            except OSError:
+                pass
+
+    return wrapper
+
+
+# --- Resolver Metrics ---
+class QueryCounter:
+    """``connection.execute_wrapper`` that counts and times SQL queries."""
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class ResolverStats:
+    """Calls, failures, wall time and SQL of one resolver, summed over calls."""
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+
+    def add(self, seconds, counter, failed):
+        self.calls += 1
+        self.failures += int(failed)
+        self.seconds += seconds
+        self.sql_queries += counter.count
+        self.sql_seconds += counter.seconds
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'ms': round(self.seconds * 1000, 3),
+            'sqlQueries': self.sql_queries,
+            'sqlMs': round(self.sql_seconds * 1000, 3),
+        }
+
+
+class ResolverMetrics:
+    """
+    Thread-safe registry of resolver timings, keyed by ``Type.field`` so the
+    number of series is bounded by the schema rather than by client queries.
+    """
+    def __init__(self):
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def record(self, field, seconds, counter, failed=False):
+        with self._lock:
+            self._fields.setdefault(field, ResolverStats()).add(seconds, counter, failed)
+
+    def snapshot(self):
+        with self._lock:
+            return {field: stats.as_dict() for field, stats in self._fields.items()}
+
+    def clear(self):
+        with self._lock:
+            self._fields.clear()
+
+    def prometheus(self):
+        """Renders the registry in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        metrics = (
+            ('crm_graphql_resolver_calls_total', "Resolver calls.", 'calls', 1),
+            ('crm_graphql_resolver_failures_total', "Resolver calls that raised.", 'failures', 1),
+            ('crm_graphql_resolver_seconds_total', "Wall time spent in resolvers.", 'ms', 1000),
+            ('crm_graphql_resolver_sql_queries_total', "SQL queries executed by resolvers.", 'sqlQueries', 1),
+            ('crm_graphql_resolver_sql_seconds_total', "Time spent in SQL queries executed by resolvers.", 'sqlMs', 1000),
+        )
+        lines = []
+        for name, help_text, key, scale in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for field, stats in sorted(snapshot.items()):
+                lines.append(f'{name}{{field="{field}"}} {stats[key] / scale:g}')
+        return "\n".join(lines) + "\n"
+
+
+resolver_metrics = ResolverMetrics()
+
+
+class RequestResolverMetrics:
+    """Resolver timings of a single request, keyed by path without list indexes."""
+    def __init__(self):
+        self.paths = {}
+
+    def record(self, path, seconds, counter, failed):
+        self.paths.setdefault(path, ResolverStats()).add(seconds, counter, failed)
+
+    def as_list(self):
+        return [{'path': path, **stats.as_dict()} for path, stats in self.paths.items()]
+
+
+class ResolverMetricsMiddleware:
+    """
+    Graphene middleware recording wall time and SQL queries per resolver.
+
+    Root ``Query`` and ``Mutation`` fields and every object-typed field are
+    measured; scalar fields only read already loaded objects and are
+    skipped. SQL is attributed to the resolver whose call executed it, so
+    a DataLoader batch is charged to the first field that loads from it.
+    Results go into ``resolver_metrics`` and onto the request context,
+    from where the views can return them in ``extensions.resolvers``.
+
+    Awaitable results of the async view are timed until they complete, but
+    their SQL runs in worker threads and is not counted.
+    """
+    def resolve(self, next, root, info, **args):
+        if not self.is_measured(info):
+            return next(root, info, **args)
+
+        counter = QueryCounter()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                result = next(root, info, **args)
+        except Exception:
+            self.record(info, time.perf_counter() - start, counter, failed=True)
+            raise
+
+        if isawaitable(result):
+            return self.await_result(result, info, start, counter)
+        self.record(info, time.perf_counter() - start, counter, failed=isinstance(result, Exception))
+        return result
+
+    async def await_result(self, result, info, start, counter):
+        try:
+            value = await result
+        except Exception:
+            self.record(info, time.perf_counter() - start, counter, failed=True)
+            raise
+        self.record(info, time.perf_counter() - start, counter, failed=False)
+        return value
+
+    def is_measured(self, info):
+        if info.field_name.startswith('__'):
+            return False
+        schema = info.schema
+        if info.parent_type in (schema.query_type, schema.mutation_type):
+            return True
+        return not is_leaf_type(get_named_type(info.return_type))
+
+    def record(self, info, seconds, counter, failed):
+        resolver_metrics.record(f"{info.parent_type.name}.{info.field_name}", seconds, counter, failed)
+
+        context = info.context
+        if context is None:
+            return
+        request_metrics = getattr(context, 'resolver_metrics', None)
+        if request_metrics is None:
+            request_metrics = context.resolver_metrics = RequestResolverMetrics()
+        path = ".".join(str(key) for key in info.path.as_list() if not isinstance(key, int))
+        request_metrics.record(path, seconds, counter, failed)
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def copy_order_products(apps, schema_editor):
+    """
+    Turns every Order.product row into an OrderItem of quantity 1.
+
+    The price paid was never stored, so the product's current price is the
+    best available snapshot.
+    """
+    Order = apps.get_model('crm', 'Order')
+    OrderItem = apps.get_model('crm', 'OrderItem')
+    rows = Order.product.through.objects.select_related('product').order_by('pk')
+
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(OrderItem(
+            order_id=row.order_id,
+            product_id=row.product_id,
+            quantity=1,
+            unit_price=row.product.price,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+    OrderItem.objects.bulk_create(batch)
+
+
+def copy_order_items(apps, schema_editor):
+    """Restores the plain Order.product rows from the order items."""
+    Order = apps.get_model('crm', 'Order')
+    OrderItem = apps.get_model('crm', 'OrderItem')
+    Through = Order.product.through
+
+    batch = []
+    for item in OrderItem.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        batch.append(Through(order_id=item.order_id, product_id=item.product_id))
+        if len(batch) >= BATCH_SIZE:
+            Through.objects.bulk_create(batch)
+            batch = []
+    Through.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='crm.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='crm.product')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('order', 'product'), name='crm_orderitem_order_product_uniq'),
+                ],
+            },
+        ),
+        migrations.RunPython(copy_order_products, copy_order_items),
+        # Django cannot add a through model to an existing many-to-many
+        # field, so the auto-created table is dropped once it was copied
+        migrations.RemoveField(
+            model_name='order',
+            name='product',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='product',
+            field=models.ManyToManyField(through='crm.OrderItem', to='crm.product'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+BATCH_SIZE = 2000
+
+
+def summarize_orders(apps, schema_editor):
+    """Builds the summaries of every customer that already placed orders."""
+    Order = apps.get_model('crm', 'Order')
+    CustomerSummary = apps.get_model('crm', 'CustomerSummary')
+    rows = (
+        Order.objects.values('customer_id')
+        .annotate(
+            order_count=Count('pk'),
+            lifetime_value=Sum('total_amount'),
+            last_order_date=Max('order_date'),
+        )
+        .order_by('customer_id')
+    )
+
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(CustomerSummary(**row))
+        if len(batch) >= BATCH_SIZE:
+            CustomerSummary.objects.bulk_create(batch)
+            batch = []
+    CustomerSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_orderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSummary',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='crm.customer')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('lifetime_value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_order_date', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(summarize_orders, migrations.RunPython.noop),
+    ]
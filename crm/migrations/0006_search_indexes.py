@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# (table, indexed columns); must match crm.search.SearchIndex
+SEARCH_INDEXES = [
+    ('crm_customer', ['name', 'email']),
+    ('crm_product', ['name']),
+]
+
+
+def document_sql(columns):
+    return "to_tsvector('simple', {})".format(
+        " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+    )
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Creates and fills an FTS5 table per searchable model on SQLite, or a
+    GIN index on the columns' tsvector on PostgreSQL.
+    """
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCH_INDEXES:
+        column_list = ', '.join(columns)
+        if vendor == 'sqlite':
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {table}_search USING fts5({column_list})")
+            schema_editor.execute(
+                f"INSERT INTO {table}_search (rowid, {column_list}) SELECT id, {column_list} FROM {table}"
+            )
+        elif vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE INDEX {table}_search_idx ON {table} USING GIN ({document_sql(columns)})"
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table, columns in SEARCH_INDEXES:
+        if vendor == 'sqlite':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}_search")
+        elif vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_customersummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
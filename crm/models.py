@@ -1,5 +1,6 @@
 # crm/models.py
 from django.db import models
+from django.db.models import Q
 
 class Customer(models.Model):
     """
@@ -15,6 +16,20 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of allCustomers
+            models.Index(fields=['created_at', 'id'], name='crm_customer_created_id_idx'),
+            # CustomerFilter.filter_by_phone_pattern prefix lookups; the
+            # pattern opclass lets PostgreSQL use it for LIKE 'x%'
+            models.Index(
+                fields=['phone'],
+                name='crm_customer_phone_idx',
+                opclasses=['varchar_pattern_ops'],
+                condition=Q(phone__isnull=False),
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -26,13 +41,25 @@ class Product(models.Model):
         name (str): The name of the product.
         price (Decimal): The price of the product.
         stock (int): The stock level of the product.
+        sku (str): The stock keeping unit, used to match catalog imports.
     """
     name = models.CharField(max_length=255)
+    sku = models.CharField(max_length=64, unique=True, blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of allProducts
+            models.Index(fields=['created_at', 'id'], name='crm_product_created_id_idx'),
+            # ProductFilter.price ranges
+            models.Index(fields=['price'], name='crm_product_price_idx'),
+            # ProductFilter.stock ranges, low_stock and the restock job
+            models.Index(fields=['stock'], name='crm_product_stock_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -41,16 +68,74 @@ class Order(models.Model):
     Order model.
     Attributes:
         customer (Customer): The customer who placed the order.
-        product (Product): The products included in the order.
+        product (Product): The products included in the order, through its items.
         total_amount (Decimal): The total amount for the order.
         order_date (DateTime): The date when the order was placed.
     """
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
-    product = models.ManyToManyField(Product)
+    product = models.ManyToManyField(Product, through='OrderItem')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     order_date = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # OrderFilter.order_date ranges and keyset pagination of allOrders
+            models.Index(fields=['order_date', 'id'], name='crm_order_date_id_idx'),
+            # OrderFilter.total_amount
+            models.Index(fields=['total_amount'], name='crm_order_total_amount_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id}"
+
+
+class OrderItem(models.Model):
+    """
+    Line item of an order.
+    Attributes:
+        order (Order): The order the line belongs to.
+        product (Product): The product ordered.
+        quantity (int): The number of units ordered.
+        unit_price (Decimal): The product's price when the order was placed.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # An order holds each product once; also serves lookups by order
+            models.UniqueConstraint(fields=['order', 'product'], name='crm_orderitem_order_product_uniq'),
+        ]
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in order {self.order_id}"
+
+
+class CustomerSummary(models.Model):
+    """
+    Precomputed order aggregates of a customer, kept up to date as orders
+    are placed and rebuilt with ``manage.py rebuild_customer_summaries``.
+    Attributes:
+        customer (Customer): The customer summarized; also the primary key.
+        order_count (int): The number of orders the customer placed.
+        lifetime_value (Decimal): The total amount of those orders.
+        last_order_date (DateTime): The date of the most recent order.
+    """
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='summary'
+    )
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_order_date = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Summary of customer {self.customer_id}"
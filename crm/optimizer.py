@@ -0,0 +1,121 @@
+from django.core.exceptions import FieldDoesNotExist
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+# --- Selection Set Walking ---
+def collect_fields(selection_set, info):
+    """
+    Returns the sub-selections of a selection set keyed by field name,
+    expanding named and inline fragments. Selections of a field requested
+    more than once (e.g. through two fragments) are merged.
+    """
+    fields = {}
+    if selection_set is None:
+        return fields
+
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            fields.setdefault(selection.name.value, []).append(selection.selection_set)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            for name, selection_sets in collect_fields(fragment.selection_set, info).items():
+                fields.setdefault(name, []).extend(selection_sets)
+        elif isinstance(selection, InlineFragmentNode):
+            for name, selection_sets in collect_fields(selection.selection_set, info).items():
+                fields.setdefault(name, []).extend(selection_sets)
+    return fields
+
+
+def collect_subfields(selection_sets, info):
+    fields = {}
+    for selection_set in selection_sets:
+        for name, subselections in collect_fields(selection_set, info).items():
+            fields.setdefault(name, []).extend(subselections)
+    return fields
+
+
+def get_node_fields(info):
+    """Returns the fields selected under ``edges { node { ... } }`` of a connection."""
+    connection_fields = collect_subfields([node.selection_set for node in info.field_nodes], info)
+    edge_fields = collect_subfields(connection_fields.get('edges', []), info)
+    return collect_subfields(edge_fields.get('node', []), info)
+
+
+# --- Queryset Planning ---
+class QueryPlan:
+    """The relations to load and columns to keep for one queryset."""
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+
+
+def plan_fields(model, fields, info, plan, prefix='', hints=None):
+    """
+    Maps selected GraphQL fields onto ``model`` and records what to load.
+
+    Columns are kept for concrete fields, forward foreign keys are joined
+    with ``select_related`` (recursing into their own selection), and
+    many-to-many fields are prefetched. ``hints`` maps GraphQL fields that
+    are not model fields to the relation their resolver reads.
+    """
+    hints = hints or {}
+    plan.only.append(prefix + model._meta.pk.name)
+
+    for name, selection_sets in fields.items():
+        if name.startswith('__'):
+            continue
+
+        field_name = hints.get(name, to_snake_case(name))
+        if field_name == 'id':
+            continue
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            continue
+
+        if field.many_to_many and not field.auto_created:
+            plan.prefetch_related.append(prefix + field.name)
+        elif field.many_to_one:
+            plan.select_related.append(prefix + field.name)
+            plan.only.append(prefix + field.name)
+            subfields = collect_subfields(selection_sets, info)
+            plan_fields(field.related_model, subfields, info, plan, prefix + field.name + '__')
+        elif field.concrete and not field.is_relation:
+            plan.only.append(prefix + field.name)
+    return plan
+
+
+def has_selected_columns(instance, info):
+    """
+    Whether an instance, possibly pruned with ``only()``, holds every
+    column read by the selection of the field being resolved.
+    """
+    deferred = instance.get_deferred_fields()
+    if not deferred:
+        return True
+    fields = collect_subfields([node.selection_set for node in info.field_nodes], info)
+    plan = plan_fields(type(instance), fields, info, QueryPlan())
+    # Columns of related models are checked by their own resolvers
+    columns = {instance._meta.get_field(name).attname for name in plan.only if '__' not in name}
+    return not columns & deferred
+
+
+def optimize_queryset(queryset, node_type, info):
+    """
+    Applies ``select_related``, ``prefetch_related`` and ``only`` to a
+    connection queryset based on what the client selected for its nodes.
+    """
+    fields = get_node_fields(info)
+    if not fields:
+        return queryset
+
+    hints = getattr(node_type, 'optimizer_hints', None)
+    plan = plan_fields(queryset.model, fields, info, QueryPlan(), hints=hints)
+
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        queryset = queryset.prefetch_related(*plan.prefetch_related)
+    return queryset.only(*plan.only)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from graphql import (
+    GraphQLInterfaceType, GraphQLObjectType, OperationType, get_named_type, get_operation_ast, print_ast,
+)
+
+from .optimizer import collect_fields
+
+# Root query fields that may be cached. Queries selecting any other root
+# field are never cached.
+CACHEABLE_FIELDS = {'hello', 'allCustomers', 'allProducts', 'allOrders'}
+# Models whose writes invalidate the results of the model they are read with
+READ_THROUGH = {
+    'orderitem': 'order',
+    'customersummary': 'customer',
+}
+
+
+def collect_models(graphql_type, selection_sets, info, models):
+    """
+    Adds the models behind every object type a selection reaches, following
+    nested fields such as ``orderSet`` down to their leaves.
+    """
+    fields = {}
+    for selection_set in selection_sets:
+        for name, subselections in collect_fields(selection_set, info).items():
+            fields.setdefault(name, []).extend(subselections)
+
+    for name, subselections in fields.items():
+        field = graphql_type.fields.get(name)
+        if field is None:
+            continue
+        field_type = get_named_type(field.type)
+        model = getattr(getattr(getattr(field_type, 'graphene_type', None), '_meta', None), 'model', None)
+        if model is not None:
+            model_name = model._meta.model_name
+            models.add(READ_THROUGH.get(model_name, model_name))
+        if isinstance(field_type, (GraphQLObjectType, GraphQLInterfaceType)):
+            collect_models(field_type, [s for s in subselections if s is not None], info, models)
+    return models
+
+
+class ResponseCache:
+    """
+    Opt-in cache of read-only query results in a Django cache backend.
+
+    Keys combine the normalized document, operation name and variables
+    with a version counter for every model the result depends on. Writes
+    to a model bump its counter, so exactly the entries built from that
+    model stop being reachable while unrelated entries stay warm.
+    """
+    key_prefix = 'crm:graphql'
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'CRM_RESPONSE_CACHE_ENABLED', False)
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'CRM_RESPONSE_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'CRM_RESPONSE_CACHE_TIMEOUT', 300)
+
+    def get_dependencies(self, schema, document, operation_name):
+        """
+        Returns the model names a query depends on, or None if it is not
+        cacheable: every model whose type the selection traverses.
+        """
+        operation = get_operation_ast(document, operation_name)
+        if operation is None or operation.operation != OperationType.QUERY:
+            return None
+
+        fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if definition.kind == 'fragment_definition'
+        }
+        info = SimpleNamespace(fragments=fragments)
+        fields = collect_fields(operation.selection_set, info)
+        if not fields or any(name not in CACHEABLE_FIELDS for name in fields):
+            return None
+        return sorted(collect_models(schema.query_type, [operation.selection_set], info, set()))
+
+    def version_key(self, model_name):
+        return f"{self.key_prefix}:version:{model_name}"
+
+    def get_key(self, schema, entry, variables, operation_name):
+        """Builds the cache key for executing a cached document against ``schema``, or None."""
+        if not self.enabled:
+            return None
+
+        if entry.normalized_hash is None:
+            entry.normalized_hash = hashlib.sha256(print_ast(entry.document).encode('utf-8')).hexdigest()
+        if operation_name not in entry.dependencies:
+            entry.dependencies[operation_name] = self.get_dependencies(schema, entry.document, operation_name)
+        dependencies = entry.dependencies[operation_name]
+        if dependencies is None:
+            return None
+
+        version_keys = [self.version_key(model) for model in dependencies]
+        versions = self.cache.get_many(version_keys)
+        request_hash = hashlib.sha256(json.dumps(
+            [entry.normalized_hash, operation_name, variables or {},
+             [versions.get(key, 0) for key in version_keys]],
+            sort_keys=True, default=str,
+        ).encode('utf-8')).hexdigest()
+        return f"{self.key_prefix}:result:{request_hash}"
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, data):
+        await self.cache.aset(key, data, self.timeout)
+
+    def invalidate(self, *model_names):
+        """Bumps the version of each model once the current transaction commits."""
+        def bump():
+            for model_name in model_names:
+                key = self.version_key(model_name)
+                # add() is a no-op when the counter exists; incr() is atomic
+                self.cache.add(key, 0, None)
+                try:
+                    self.cache.incr(key)
+                except ValueError:
+                    self.cache.set(key, 1, None)
+
+        transaction.on_commit(bump)
+
+
+response_cache = ResponseCache()
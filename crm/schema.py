@@ -1,12 +1,19 @@
+import asyncio
+
 import graphene
 from graphene_django.types import DjangoObjectType
 from graphene_django.filter import DjangoFilterConnectionField
-from django.db.models import Sum
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncWeek
 from decimal import Decimal as PyDecimal
 import django_filters
 
-from .models import Customer, Product, Order
+from .models import Customer, Product, Order, OrderItem
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .bulk import bulk_create_customers, create_orders, restock_low_stock_products
+from .fields import CountableConnection, KeysetConnectionField
+from .loaders import get_loaders, is_async_execution
+from .optimizer import collect_subfields, has_selected_columns
 # from crm.models import Product
 
 # --- Custom Scalar for Float to Decimal Conversion ---
@@ -19,27 +26,222 @@ class FloatDecimal(graphene.Decimal):
 
 
 # --- GraphQL Type Definitions ---
+def load_summary_value(info, customer_id, attribute, default=None):
+    """Reads one attribute of a customer's summary through the request loader."""
+    loader = get_loaders(info).customer_summary
+    if is_async_execution(info):
+        async def aload_value():
+            summary = await loader.aload(customer_id)
+            return getattr(summary, attribute) if summary is not None else default
+        return aload_value()
+    summary = loader.load(customer_id)
+    # Customers without orders have no summary row
+    return getattr(summary, attribute) if summary is not None else default
+
+
 class CustomerType(DjangoObjectType):
     class Meta:
         model = Customer
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
+        # Read through the aggregate fields below
+        exclude = ('summary',)
+
+    # Aggregates of the customer's orders, read from CustomerSummary
+    order_count = graphene.Int()
+    lifetime_value = graphene.Decimal()
+    last_order_date = graphene.DateTime()
+
+    @classmethod
+    def queue_loaders(cls, customers, loaders):
+        loaders.customer_summary.enqueue(customer.pk for customer in customers)
+
+    def resolve_order_count(self, info):
+        return load_summary_value(info, self.pk, 'order_count', 0)
+
+    def resolve_lifetime_value(self, info):
+        return load_summary_value(info, self.pk, 'lifetime_value', PyDecimal('0.00'))
+
+    def resolve_last_order_date(self, info):
+        return load_summary_value(info, self.pk, 'last_order_date')
 
 
 class ProductType(DjangoObjectType):
     class Meta:
         model = Product
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
+        # Order lines are read through their order
+        exclude = ('orderitem_set',)
+
+
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ('product', 'quantity', 'unit_price')
+
+    line_total = graphene.Decimal()
+
+    def resolve_product(self, info):
+        if is_async_execution(info):
+            return get_loaders(info).product.aload(self.product_id)
+        return get_loaders(info).product.load(self.product_id)
+
+    def resolve_line_total(self, info):
+        return self.line_total
 
 
 class OrderType(DjangoObjectType):
     class Meta:
         model = Order
         interfaces = (graphene.relay.Node,)
+        connection_class = CountableConnection
     
     products = graphene.List(ProductType)
-    
+    # Quantities and captured prices, read from the order items alone
+    items = graphene.List(OrderItemType)
+
+    # GraphQL fields backed by a relation the query optimizer should load.
+    optimizer_hints = {'products': 'product'}
+
+    @classmethod
+    def queue_loaders(cls, orders, loaders):
+        # Relations already loaded by the query optimizer seed the loaders.
+        # Instances pruned with only() are kept out: other selections
+        # sharing the loaders would read their missing columns row by row.
+        for order in orders:
+            if Order.customer.is_cached(order) and not order.customer.get_deferred_fields():
+                loaders.customer.prime(order.customer_id, order.customer)
+            prefetched = getattr(order, '_prefetched_objects_cache', {}).get('product')
+            if prefetched is not None and not any(product.get_deferred_fields() for product in prefetched):
+                loaders.products_by_order.prime(order.pk, list(prefetched))
+        # Pruned columns are skipped; reading them would cost a query per order
+        customer_ids = [
+            order.customer_id for order in orders
+            if 'customer_id' not in order.get_deferred_fields()
+        ]
+        loaders.customer.enqueue(customer_ids)
+        # Joined customers bypass Loaders.load_customers, which queues these
+        loaders.customer_summary.enqueue(customer_ids)
+        loaders.products_by_order.enqueue(order.pk for order in orders)
+        loaders.items_by_order.enqueue(order.pk for order in orders)
+
+    def resolve_customer(self, info):
+        # The customer joined by the query optimizer for this selection
+        if Order.customer.is_cached(self) and has_selected_columns(self.customer, info):
+            return self.customer
+        if is_async_execution(info):
+            return get_loaders(info).customer.aload(self.customer_id)
+        return get_loaders(info).customer.load(self.customer_id)
+
     def resolve_products(self, info):
-        return self.product.all()
+        if is_async_execution(info):
+            return get_loaders(info).products_by_order.aload(self.pk)
+        return get_loaders(info).products_by_order.load(self.pk)
+
+    def resolve_items(self, info):
+        if is_async_execution(info):
+            return get_loaders(info).items_by_order.aload(self.pk)
+        return get_loaders(info).items_by_order.load(self.pk)
+
+
+# --- Reporting Types ---
+def to_amount(value):
+    """Normalizes a SUM over money columns, which is NULL for no rows."""
+    return (value or PyDecimal('0')).quantize(PyDecimal('0.01'))
+
+
+class StatsPeriod(graphene.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+
+
+class CrmStatsPeriodType(graphene.ObjectType):
+    period_start = graphene.DateTime()
+    order_count = graphene.Int()
+    revenue = graphene.Decimal()
+
+
+class CrmStatsType(graphene.ObjectType):
+    """
+    Customer and order totals computed with SQL aggregates, so their cost
+    does not grow with the number of orders returned to the client.
+    """
+    customer_count = graphene.Int()
+    order_count = graphene.Int()
+    total_revenue = graphene.Decimal()
+    periods = graphene.List(CrmStatsPeriodType)
+
+    def __init__(self, orders, group_by=None):
+        super().__init__()
+        self.orders = orders
+        self.group_by = group_by
+        self._order_totals = None
+
+    def order_totals(self):
+        # orderCount and totalRevenue share one aggregate query
+        if self._order_totals is None:
+            self._order_totals = self.orders.aggregate(
+                order_count=Count('pk'), revenue=Sum('total_amount')
+            )
+        return self._order_totals
+
+    def aorder_totals(self):
+        # Both resolvers await the same task when executed concurrently
+        if self._order_totals is None:
+            self._order_totals = asyncio.ensure_future(self.orders.aaggregate(
+                order_count=Count('pk'), revenue=Sum('total_amount')
+            ))
+        return self._order_totals
+
+    def period_rows(self):
+        trunc = TruncWeek if self.group_by == StatsPeriod.WEEK else TruncDay
+        return (
+            self.orders
+            .annotate(period_start=trunc('order_date'))
+            .values('period_start')
+            .annotate(order_count=Count('pk'), revenue=Sum('total_amount'))
+            .order_by('period_start')
+        )
+
+    @staticmethod
+    def to_period(row):
+        return CrmStatsPeriodType(
+            period_start=row['period_start'],
+            order_count=row['order_count'],
+            revenue=to_amount(row['revenue']),
+        )
+
+    async def aresolve_order_count(self):
+        return (await self.aorder_totals())['order_count']
+
+    async def aresolve_total_revenue(self):
+        return to_amount((await self.aorder_totals())['revenue'])
+
+    async def aresolve_periods(self):
+        return [self.to_period(row) async for row in self.period_rows()]
+
+    def resolve_customer_count(self, info):
+        if is_async_execution(info):
+            return Customer.objects.acount()
+        return Customer.objects.count()
+
+    def resolve_order_count(self, info):
+        if is_async_execution(info):
+            return self.aresolve_order_count()
+        return self.order_totals()['order_count']
+
+    def resolve_total_revenue(self, info):
+        if is_async_execution(info):
+            return self.aresolve_total_revenue()
+        return to_amount(self.order_totals()['revenue'])
+
+    def resolve_periods(self, info):
+        if self.group_by is None:
+            return None
+        if is_async_execution(info):
+            return self.aresolve_periods()
+        return [self.to_period(row) for row in self.period_rows()]
 
 
 # --- GraphQL Input Types ---
@@ -53,11 +255,18 @@ class ProductInput(graphene.InputObjectType):
     name = graphene.String(required=True)
     price = FloatDecimal(required=True)
     stock = graphene.Int()
+    sku = graphene.String()
+
+
+class OrderItemInput(graphene.InputObjectType):
+    productId = graphene.ID(required=True)
+    quantity = graphene.Int(default_value=1)
 
 
 class OrderInput(graphene.InputObjectType):
     customerId = graphene.ID(required=True)
-    productIds = graphene.List(graphene.ID, required=True)
+    productIds = graphene.List(graphene.ID)
+    items = graphene.List(OrderItemInput)
 
 
 # --- GraphQL Mutation Classes ---
@@ -86,22 +295,10 @@ class BulkCreateCustomers(graphene.Mutation):
 
     class Arguments:
         input = graphene.List(CustomerInput, required=True)
+        batch_size = graphene.Int()
 
-    def mutate(self, info, input):
-        created_customers = []
-        errors = []
-        
-        for data in input:
-            try:
-                customer = Customer.objects.create(
-                    name=data.get('name'),
-                    email=data.get('email'),
-                    phone=data.get('phone')
-                )
-                created_customers.append(customer)
-            except Exception as e:
-                errors.append(f"Error for email {data.get('email')}: {str(e)}")
-
+    def mutate(self, info, input, batch_size=None):
+        created_customers, errors = bulk_create_customers(input, batch_size=batch_size)
         return BulkCreateCustomers(customers=created_customers, errors=errors)
 
 
@@ -129,7 +326,8 @@ class CreateProduct(graphene.Mutation):
             product = Product.objects.create(
                 name=input.name,
                 price=input.price,
-                stock=input.stock
+                stock=input.stock,
+                sku=input.sku or None
             )
             return CreateProduct(
                 product=product,
@@ -142,6 +340,17 @@ class CreateProduct(graphene.Mutation):
             )
 
 
+def prime_order_loaders(info, order, items):
+    """Seeds the request loaders with the items an order was created with."""
+    loaders = get_loaders(info)
+    # Customers were read without their columns; they load in one batch if selected
+    loaders.customer.enqueue([order.customer_id])
+    loaders.items_by_order.prime(order.pk, items)
+    loaders.products_by_order.prime(order.pk, [item.product for item in items])
+    for item in items:
+        loaders.product.prime(item.product_id, item.product)
+
+
 class CreateOrder(graphene.Mutation):
     order = graphene.Field(OrderType)
     message = graphene.String()
@@ -151,69 +360,110 @@ class CreateOrder(graphene.Mutation):
 
     def mutate(self, info, input):
         try:
-            customer = Customer.objects.get(id=input.customerId)
-        except Customer.DoesNotExist:
-            return CreateOrder(order=None, message="Error creating order: Customer not found.")
-        
-        if not input.productIds:
-            return CreateOrder(order=None, message="Error: An order must contain at least one product.")
-        
-        products = Product.objects.filter(id__in=input.productIds)
-        if len(products) != len(input.productIds):
-            existing_ids = set(p.id for p in products)
-            missing_ids = [id for id in input.productIds if id not in existing_ids]
-
-            return CreateOrder(
-                order=None,
-                message=f"Error: Product(s) not found with IDs: {', '.join(map(str, missing_ids))}"
-            )
-        
+            [(order, items, error)] = create_orders([input])
+        except Exception as e:
+            return CreateOrder(order=None, message=f"Error creating order: {str(e)}")
+
+        if error:
+            return CreateOrder(order=None, message=error)
+
+        prime_order_loaders(info, order, items)
+        return CreateOrder(order=order, message="Order created successfully")
+
+
+class CreateOrders(graphene.Mutation):
+    orders = graphene.List(OrderType)
+    errors = graphene.List(graphene.String)
+
+    class Arguments:
+        input = graphene.List(OrderInput, required=True)
+
+    def mutate(self, info, input):
         try:
-            order = Order.objects.create(customer=customer)
-            order.product.set(products)
-            total_amount = products.aggregate(Sum('price'))['price__sum']
-            order.total_amount = total_amount
-            order.save()
-            
-            return CreateOrder(order=order, message="Order created successfully")
+            results = create_orders(input)
         except Exception as e:
-            return CreateOrder(order=None, message=f"Error creating order: {str(e)}"
-            )
+            return CreateOrders(orders=[], errors=[f"Error creating orders: {str(e)}"])
+
+        created_orders = []
+        errors = []
+        for index, (order, items, error) in enumerate(results):
+            if error:
+                errors.append(f"Error for order {index}: {error}")
+                continue
+            prime_order_loaders(info, order, items)
+            created_orders.append(order)
+
+        return CreateOrders(orders=created_orders, errors=errors)
 
 
 # ---  Schedule a GraphQL Mutation for Product Stock Alerts ---
 class UpdateLowStockProducts(graphene.Mutation):
     updated_products = graphene.List(ProductType)
+    updated_count = graphene.Int()
     message = graphene.String()
     
     class Arguments:
-        pass
+        threshold = graphene.Int(default_value=10)
+        increment = graphene.Int(default_value=10)
+        lock_rows = graphene.Boolean(default_value=False)
+        batch_size = graphene.Int()
     
-    def mutate(self, info):
-        # Find products with stock less than 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
-        updated_list = []
-        for product in low_stock_products:
-            # Increment stock by 10
-            product.stock += 10
-            product.save()
-            updated_list.append(product)
-
-        if updated_list:
-            message = f"Successfully updated stock for {len(updated_list)} products."
+    def mutate(self, info, threshold, increment, lock_rows, batch_size=None):
+        if increment <= 0:
+            return UpdateLowStockProducts(
+                updated_products=[],
+                updated_count=0,
+                message="Error updating stock: Increment must be a positive number."
+            )
+
+        # Only materialize the updated rows when the client asked for them
+        selected = collect_subfields([node.selection_set for node in info.field_nodes], info)
+        updated_count, updated_list = restock_low_stock_products(
+            threshold=threshold,
+            increment=increment,
+            return_products='updatedProducts' in selected,
+            lock=lock_rows,
+            batch_size=batch_size,
+        )
+
+        if updated_count:
+            message = f"Successfully updated stock for {updated_count} products."
         else:
             message = "No products found with low stock."
 
-        return UpdateLowStockProducts(updated_products=updated_list, message=message)
+        return UpdateLowStockProducts(
+            updated_products=updated_list,
+            updated_count=updated_count,
+            message=message
+        )
 
 
 # --- Root Query and Mutation Classes ---
 class Query(graphene.ObjectType):
     hello = graphene.String(default_value="Hello, GraphQL!")
-    allCustomers = DjangoFilterConnectionField(CustomerType, filterset_class=CustomerFilter)
-    allProducts = DjangoFilterConnectionField(ProductType, filterset_class=ProductFilter)
-    allOrders = DjangoFilterConnectionField(OrderType, filterset_class=OrderFilter)
+    allCustomers = KeysetConnectionField(
+        CustomerType, ordering_field='created_at', filterset_class=CustomerFilter
+    )
+    allProducts = KeysetConnectionField(
+        ProductType, ordering_field='created_at', filterset_class=ProductFilter
+    )
+    allOrders = KeysetConnectionField(
+        OrderType, ordering_field='order_date', filterset_class=OrderFilter
+    )
+    crmStats = graphene.Field(
+        CrmStatsType,
+        group_by=StatsPeriod(),
+        since=graphene.DateTime(),
+        until=graphene.DateTime(),
+    )
+
+    def resolve_crmStats(self, info, group_by=None, since=None, until=None):
+        orders = Order.objects.all()
+        if since is not None:
+            orders = orders.filter(order_date__gte=since)
+        if until is not None:
+            orders = orders.filter(order_date__lt=until)
+        return CrmStatsType(orders, group_by=group_by)
 
 
 class Mutation(graphene.ObjectType):
@@ -221,4 +471,5 @@ class Mutation(graphene.ObjectType):
     bulkCreateCustomers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    createOrders = CreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
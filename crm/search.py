@@ -0,0 +1,191 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Least
+
+from .models import Customer, Product, OrderItem
+
+# Annotation holding the rank of a search result; lower ranks match better
+SEARCH_RANK = 'search_rank'
+
+
+def search_terms(text):
+    """Splits user input into lowercase words, dropping any query syntax."""
+    return re.findall(r'\w+', (text or '').lower())
+
+
+class SearchIndex:
+    """
+    Full-text index over text columns of one model.
+
+    On SQLite the columns are copied into an FTS5 table whose rowid is the
+    primary key, kept in sync by the signals in ``crm/signals.py``. On
+    PostgreSQL a GIN index on the columns' ``tsvector`` is maintained by
+    the database itself. Other backends fall back to ``icontains``.
+
+    Every word of a query must match the start of a word in any column.
+    """
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.table = f"{model._meta.db_table}_search"
+
+    @property
+    def backend(self):
+        if connection.vendor in ('sqlite', 'postgresql'):
+            return connection.vendor
+        return None
+
+    def document_sql(self, alias):
+        """The ``tsvector`` expression the PostgreSQL index is built on."""
+        quote = connection.ops.quote_name
+        columns = " || ' ' || ".join(
+            f"coalesce({alias}.{quote(field)}, '')" for field in self.fields
+        )
+        return f"to_tsvector('simple', {columns})"
+
+    def query_string(self, terms):
+        if self.backend == 'sqlite':
+            return ' '.join(f'"{term}"*' for term in terms)
+        return ' & '.join(f"{term}:*" for term in terms)
+
+    def match(self, column, terms):
+        """A condition on ``column`` (quoted SQL) being the key of a matching row."""
+        quote = connection.ops.quote_name
+        if self.backend == 'sqlite':
+            sql = f"{column} IN (SELECT rowid FROM {quote(self.table)} WHERE {quote(self.table)} MATCH %s)"
+        else:
+            sql = (
+                f"{column} IN (SELECT {quote('id')} FROM {quote(self.model._meta.db_table)} AS {quote('match')} "
+                f"WHERE {self.document_sql(quote('match'))} @@ to_tsquery('simple', %s))"
+            )
+        return RawSQL(sql, [self.query_string(terms)], output_field=BooleanField())
+
+    def rank(self, column, terms):
+        """The rank of the row keyed by ``column``, NULL if it does not match."""
+        quote = connection.ops.quote_name
+        if self.backend == 'sqlite':
+            # FTS5 ranks by bm25, which is negative and lower for better matches
+            sql = (
+                f"SELECT rank FROM {quote(self.table)} "
+                f"WHERE {quote(self.table)} MATCH %s AND rowid = {column}"
+            )
+        else:
+            sql = (
+                f"SELECT -ts_rank({self.document_sql(quote('rank'))}, to_tsquery('simple', %s)) "
+                f"FROM {quote(self.model._meta.db_table)} AS {quote('rank')} "
+                f"WHERE {quote('rank')}.{quote('id')} = {column}"
+            )
+        return RawSQL(f"({sql})", [self.query_string(terms)], output_field=FloatField())
+
+    def search(self, queryset, text):
+        """Filters ``queryset`` of the indexed model to matches, annotated with their rank."""
+        terms = search_terms(text)
+        if not terms:
+            return queryset.none()
+        if self.backend is None:
+            condition = Q()
+            for term in terms:
+                condition &= Q(*[Q(**{f"{field}__icontains": term}) for field in self.fields], _connector=Q.OR)
+            return queryset.filter(condition).annotate(**{SEARCH_RANK: Value(0.0)})
+
+        column = self.column(self.model._meta.db_table, 'id')
+        return queryset.filter(self.match(column, terms)).annotate(**{SEARCH_RANK: self.rank(column, terms)})
+
+    @staticmethod
+    def column(table, name):
+        quote = connection.ops.quote_name
+        return f"{quote(table)}.{quote(name)}"
+
+    # --- Synchronization (SQLite) ---
+    def update(self, objs):
+        """Writes the indexed columns of saved objects to the FTS5 table."""
+        if self.backend != 'sqlite' or not objs:
+            return
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field) for field in self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {quote(self.table)} (rowid, {columns}) VALUES ({placeholders})",
+                [[obj.pk, *(getattr(obj, field) for field in self.fields)] for obj in objs],
+            )
+
+    def delete(self, pks):
+        if self.backend != 'sqlite' or not pks:
+            return
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {quote(self.table)} WHERE rowid = %s", [[pk] for pk in pks])
+
+    def rebuild(self):
+        """Recopies every row of the model into the FTS5 table."""
+        if self.backend != 'sqlite':
+            return
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field) for field in self.fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {quote(self.table)}")
+            cursor.execute(
+                f"INSERT INTO {quote(self.table)} (rowid, {columns}) "
+                f"SELECT {quote('id')}, {columns} FROM {quote(self.model._meta.db_table)}"
+            )
+
+
+customer_index = SearchIndex(Customer, ['name', 'email'])
+product_index = SearchIndex(Product, ['name'])
+SEARCH_INDEXES = (customer_index, product_index)
+
+
+def search_customers(queryset, text):
+    return customer_index.search(queryset, text)
+
+
+def search_products(queryset, text):
+    return product_index.search(queryset, text)
+
+
+def search_orders(queryset, text):
+    """
+    Filters orders to those whose customer or any of whose products match,
+    ranked by the better of the customer's and the best product's rank.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.none()
+    if customer_index.backend is None:
+        customers = search_customers(Customer.objects.all(), text).values('pk')
+        products = search_products(Product.objects.all(), text).values('pk')
+        return queryset.filter(
+            Q(customer__in=customers) | Q(pk__in=OrderItem.objects.filter(product__in=products).values('order_id'))
+        ).annotate(**{SEARCH_RANK: Value(0.0)})
+
+    quote = connection.ops.quote_name
+    order_table = queryset.model._meta.db_table
+    item_table = OrderItem._meta.db_table
+    customer_column = SearchIndex.column(order_table, 'customer_id')
+    item_product = SearchIndex.column(item_table, 'product_id')
+
+    product_match = product_index.match(item_product, terms)
+    product_match_sql, product_match_params = product_match.sql, product_match.params
+    has_product = RawSQL(
+        f"{SearchIndex.column(order_table, 'id')} IN (SELECT {quote('order_id')} FROM {quote(item_table)} "
+        f"WHERE {product_match_sql})",
+        product_match_params,
+        output_field=BooleanField(),
+    )
+    product_rank = product_index.rank(item_product, terms)
+    best_product_rank = RawSQL(
+        f"(SELECT MIN({product_rank.sql}) FROM {quote(item_table)} "
+        f"WHERE {SearchIndex.column(item_table, 'order_id')} = {SearchIndex.column(order_table, 'id')})",
+        product_rank.params,
+        output_field=FloatField(),
+    )
+    return queryset.filter(Q(customer_index.match(customer_column, terms)) | Q(has_product)).annotate(**{
+        SEARCH_RANK: Least(
+            Coalesce(customer_index.rank(customer_column, terms), 0.0),
+            Coalesce(best_product_rank, 0.0),
+        ),
+    })
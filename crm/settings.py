@@ -131,9 +131,48 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Graphene-Django settings
 GRAPHENE = {
-    'SCHEMA': 'alx_backend_graphql_crm.schema.schema'
+    'SCHEMA': 'alx_backend_graphql_crm.schema.schema',
+    'MIDDLEWARE': [
+        # Resolver timings and SQL counts, exported at /graphql/metrics
+        'crm.metrics.ResolverMetricsMiddleware',
+    ],
 }
 
+# Rows per lookup and INSERT for bulk mutations
+CRM_BULK_BATCH_SIZE = 1000
+
+# Orders fetched per round trip by order exports
+CRM_EXPORT_CHUNK_SIZE = 2000
+
+# Parsed and validated query documents kept by the GraphQL view
+CRM_GRAPHQL_DOCUMENT_CACHE_SIZE = 1000
+
+# Query limits: nesting depth, and estimated objects resolved per operation,
+# counting connections at their page size and other lists at LIST_SIZE
+CRM_GRAPHQL_MAX_DEPTH = 10
+CRM_GRAPHQL_MAX_COST = 5000
+CRM_GRAPHQL_LIST_SIZE = 10
+
+# Operations accepted in one batched request (a JSON array of operations)
+CRM_GRAPHQL_MAX_BATCH_SIZE = 10
+
+# Return per-resolver timings of each request in extensions.resolvers
+CRM_GRAPHQL_RESOLVER_EXTENSIONS = False
+
+# Opt-in cache of read-only query results, invalidated by model signals
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CRM_RESPONSE_CACHE_ENABLED = False
+CRM_RESPONSE_CACHE_ALIAS = 'default'
+CRM_RESPONSE_CACHE_TIMEOUT = 300
+
+# Cron and Celery jobs execute GraphQL in-process ('local') or over 'http'
+CRM_GRAPHQL_TRANSPORT = 'local'
+CRM_GRAPHQL_URL = 'http://localhost:8000/graphql'
+
 CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
@@ -0,0 +1,45 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Customer, Product, Order, OrderItem
+from .response_cache import response_cache
+from .search import customer_index, product_index
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def invalidate_model_responses(sender, **kwargs):
+    """Evicts cached query results that were read from the changed model."""
+    response_cache.invalidate(sender._meta.model_name)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_responses(sender, **kwargs):
+    # Items are read as part of their order
+    response_cache.invalidate('order')
+
+
+@receiver(m2m_changed, sender=Order.product.through)
+def invalidate_order_product_responses(sender, action, **kwargs):
+    if action.startswith('post_'):
+        response_cache.invalidate('order')
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    """Copies the searchable columns of a saved row into its FTS5 table."""
+    index = customer_index if sender is Customer else product_index
+    index.update([instance])
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+def delete_from_search_index(sender, instance, **kwargs):
+    index = customer_index if sender is Customer else product_index
+    index.delete([instance.pk])
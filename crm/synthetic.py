@@ -0,0 +1,261 @@
+import math
+import random
+import time
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+import django
+from django.apps import apps
+from django.db import OperationalError, connection, connections, transaction
+from django.utils import timezone
+
+from .bulk import rebuild_customer_summaries
+from .models import Customer, Product, Order, OrderItem
+from .search import SEARCH_INDEXES
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Alice", "Amara", "Ben", "Carlos", "Chen", "Chloe", "David", "Elena",
+    "Emeka", "Fatima", "Grace", "Hana", "Ivan", "James", "Julia", "Kofi", "Lena", "Liam",
+    "Maria", "Mateo", "Mei", "Nadia", "Noah", "Olivia", "Omar", "Priya", "Ravi", "Sara",
+    "Sofia", "Tariq", "Uma", "Victor", "Wei", "Yara", "Yusuf", "Zoe",
+]
+LAST_NAMES = [
+    "Adeyemi", "Brown", "Chen", "Costa", "Davis", "Dubois", "Garcia", "Ivanova", "Johnson",
+    "Kim", "Kowalski", "Lopez", "Martin", "Meyer", "Müller", "Nakamura", "Nguyen", "Okafor",
+    "Patel", "Rossi", "Santos", "Schmidt", "Silva", "Singh", "Smith", "Tanaka", "Wilson", "Wright",
+]
+EMAIL_DOMAINS = ["example.com", "example.org", "example.net", "mail.example.com"]
+PRODUCT_ADJECTIVES = [
+    "Compact", "Deluxe", "Ergonomic", "Portable", "Premium", "Rugged", "Smart", "Ultra",
+    "Wireless", "Classic", "Eco", "Pro", "Mini", "Heavy-Duty", "Slim",
+]
+PRODUCT_NOUNS = [
+    "Laptop", "Mouse", "Keyboard", "Monitor", "Headphones", "Speaker", "Webcam", "Charger",
+    "Backpack", "Desk Lamp", "Router", "Tablet", "Phone Case", "Microphone", "Hard Drive",
+    "Printer", "Chair", "Notebook", "Water Bottle", "Smartwatch",
+]
+
+# Relative frequency of the number of products in an order
+ITEMS_PER_ORDER = {1: 45, 2: 25, 3: 14, 4: 8, 5: 4, 6: 2, 8: 1, 10: 1}
+# Relative frequency of the quantity ordered of each product
+QUANTITIES = {1: 70, 2: 18, 3: 7, 5: 3, 10: 2}
+# Orders per hour of the day, peaking in the afternoon and evening
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 10, 11, 10, 10, 10, 11, 12, 13, 12, 10, 7, 4, 2]
+
+
+def zipf_cum_weights(count, exponent):
+    """Cumulative weights under which a few keys are picked far more often than the rest."""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def rows_in_chunks(total, size):
+    """Yields ``(start, count)`` for successive chunks of at most ``size`` rows."""
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+@contextmanager
+def explicit_order_dates():
+    """
+    Lets ``bulk_create`` write the generated ``order_date`` and
+    ``created_at`` of orders instead of the current time.
+    """
+    fields = [Order._meta.get_field('order_date'), Order._meta.get_field('created_at')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def build_customers(rng, start, count, run_id):
+    customers = []
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        customers.append(Customer(
+            name=f"{first} {last}",
+            email=f"{first}.{last}.{run_id}{i}@{rng.choice(EMAIL_DOMAINS)}".lower(),
+            phone=f"+1{rng.randint(200, 999)}{rng.randint(1000000, 9999999)}" if rng.random() < 0.8 else None,
+        ))
+    return customers
+
+
+def build_products(rng, start, count):
+    products = []
+    for i in range(start, start + count):
+        # Log-normal prices: mostly tens of dollars, a long tail of expensive items
+        price = min(max(rng.lognormvariate(math.log(40), 1.0), 1), 5000)
+        products.append(Product(
+            name=f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_NOUNS)} {i}",
+            price=Decimal(f"{price:.2f}"),
+            stock=rng.randint(0, 500),
+        ))
+    return products
+
+
+def generate_customers(count, batch_size=10_000, seed=None, run_id=None, log=None):
+    rng = random.Random(seed)
+    run_id = run_id or f"{int(time.time()):x}-"
+    for start, size in rows_in_chunks(count, batch_size):
+        Customer.objects.bulk_create(build_customers(rng, start, size, run_id))
+        if log:
+            log(f"Created {start + size} of {count} customers")
+
+
+def generate_products(count, batch_size=10_000, seed=None, log=None):
+    rng = random.Random(seed)
+    for start, size in rows_in_chunks(count, batch_size):
+        Product.objects.bulk_create(build_products(rng, start, size))
+        if log:
+            log(f"Created {start + size} of {count} products")
+
+
+# --- Orders ---
+# Set per process by ``init_order_worker``
+_catalogue = None
+# Attempts at writing a chunk while other processes hold the SQLite write lock
+MAX_WRITE_ATTEMPTS = 20
+
+
+class Catalogue:
+    """Customer and product keys to draw orders from, with skewed popularity."""
+    def __init__(self, days):
+        self.customer_ids = list(Customer.objects.order_by('pk').values_list('pk', flat=True))
+        products = list(Product.objects.order_by('pk').values_list('pk', 'price'))
+        self.product_ids = [pk for pk, _ in products]
+        self.prices = dict(products)
+        # Frequent buyers and best-sellers
+        self.customer_weights = zipf_cum_weights(len(self.customer_ids), 0.6)
+        self.product_weights = zipf_cum_weights(len(self.product_ids), 1.0)
+        self.items_per_order = list(ITEMS_PER_ORDER)
+        self.items_weights = list(accumulate(ITEMS_PER_ORDER.values()))
+        self.quantities = list(QUANTITIES)
+        self.quantity_weights = list(accumulate(QUANTITIES.values()))
+        self.hour_weights = list(accumulate(HOURLY_WEIGHTS))
+        self.days = days
+        self.now = timezone.now()
+
+    def pick(self, rng, keys, cum_weights):
+        return keys[bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+    def order_date(self, rng):
+        # Order volume grows over time, so recent days are busier
+        day = int(self.days * (1 - math.sqrt(rng.random())))
+        hour = self.pick(rng, range(24), self.hour_weights)
+        date = (self.now - timedelta(days=day)).replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+        return min(date, self.now)
+
+    def build_order(self, rng):
+        lines = {}
+        wanted = min(self.pick(rng, self.items_per_order, self.items_weights), len(self.product_ids))
+        for _ in range(wanted * 4):
+            lines.setdefault(
+                self.pick(rng, self.product_ids, self.product_weights),
+                self.pick(rng, self.quantities, self.quantity_weights),
+            )
+            if len(lines) == wanted:
+                break
+
+        date = self.order_date(rng)
+        order = Order(
+            customer_id=self.pick(rng, self.customer_ids, self.customer_weights),
+            order_date=date,
+            created_at=date,
+        )
+        items = [
+            OrderItem(order=order, product_id=product_id, quantity=quantity, unit_price=self.prices[product_id])
+            for product_id, quantity in lines.items()
+        ]
+        order.total_amount = sum(item.line_total for item in items)
+        return order, items
+
+
+def init_order_worker(days):
+    """Loads the catalogue once per process; spawned processes set Django up first."""
+    global _catalogue
+    if not apps.ready:
+        django.setup()
+    _catalogue = Catalogue(days)
+
+
+def write_order_chunk(chunk):
+    """Generates and inserts one chunk of orders with their items."""
+    index, size, seed = chunk
+    rng = random.Random(f"{seed}-{index}" if seed is not None else None)
+    generated = [_catalogue.build_order(rng) for _ in range(size)]
+
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        try:
+            with explicit_order_dates(), transaction.atomic():
+                Order.objects.bulk_create([order for order, _ in generated])
+                # The order foreign keys are filled from the saved orders
+                items = OrderItem.objects.bulk_create([item for _, order_items in generated for item in order_items])
+            return size, len(items)
+        except OperationalError:
+            # SQLite lets one process write at a time and gives up after its timeout
+            if connection.vendor != 'sqlite' or attempt == MAX_WRITE_ATTEMPTS:
+                raise
+            for order, order_items in generated:
+                order.pk = None
+                # Items keep the rolled-back ids unless they are bound afresh
+                for item in order_items:
+                    item.order = order
+            time.sleep(0.1 * attempt)
+
+
+def generate_orders(count, batch_size=10_000, workers=1, seed=None, days=730, log=None):
+    """
+    Inserts ``count`` orders in chunks of ``batch_size`` against the
+    existing customers and products.
+
+    With ``workers`` above one, chunks are generated and written by a pool
+    of processes. That pays off on PostgreSQL; SQLite serializes writers,
+    so extra processes only overlap row generation with the inserts.
+
+    Returns:
+        tuple: (orders created, order items created)
+    """
+    chunks = [(index, size, seed) for index, (_, size) in enumerate(rows_in_chunks(count, batch_size))]
+    created_orders = created_items = 0
+
+    def report(result):
+        nonlocal created_orders, created_items
+        created_orders += result[0]
+        created_items += result[1]
+        if log:
+            log(f"Created {created_orders} of {count} orders ({created_items} items)")
+
+    if workers <= 1:
+        init_order_worker(days)
+        for chunk in chunks:
+            report(write_order_chunk(chunk))
+        return created_orders, created_items
+
+    # Forked workers must open their own connections
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_order_worker, initargs=(days,)) as pool:
+        for result in pool.map(write_order_chunk, chunks):
+            report(result)
+    return created_orders, created_items
+
+
+def top_up_tables(rows, batch_size=10_000, log=None):
+    """
+    Adds synthetic rows until there are ``rows`` orders and a tenth as many
+    customers and products, for benchmarks that need a volume to run against.
+    The search index and customer summaries are rebuilt afterwards.
+    """
+    secondary_rows = max(rows // 10, 1)
+    generate_customers(max(secondary_rows - Customer.objects.count(), 0), batch_size, log=log)
+    generate_products(max(secondary_rows - Product.objects.count(), 0), batch_size, log=log)
+    generate_orders(max(rows - Order.objects.count(), 0), batch_size, log=log)
+    # Generated rows bypass the signals and create_orders
+    for index in SEARCH_INDEXES:
+        index.rebuild()
+    rebuild_customer_summaries(batch_size)
@@ -1,35 +1,31 @@
 import sys
 import datetime
 from celery import shared_task
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from gql import gql
 # from datetime import datetime
-import requests
+
+from crm.graphql_client import get_client
+from crm.metrics import timed_job
 
 @shared_task
+@timed_job
 def generate_crm_report():
     """
-    Generates a weekly CRM report by querying the GraphQL endpoint.
+    Generates a weekly CRM report by querying the GraphQL schema.
     """
     try:
         # GraphQL Setup
-        transport = RequestsHTTPTransport(url="http://localhost:8000/graphql")
-        client = Client(transport=transport, fetch_schema_from_transport=True)
+        client = get_client()
 
-        # GraphQL query to get the required data
+        # GraphQL query to get the required data. The totals are SQL
+        # aggregates, so the report costs the same however many orders exist.
         query = gql(
             """
             query CrmReport {
-                allCustomers {
-                  totalCount
-                }
-                allOrders {
-                  totalCount
-                  edges {
-                    node {
-                      totalAmount
-                    }
-                  }
+                crmStats {
+                  customerCount
+                  orderCount
+                  totalRevenue
                 }
             }
             """
@@ -39,15 +35,10 @@ def generate_crm_report():
         result = client.execute(query)
         
         # Extract the data
-        total_customers = result.get('allCustomers', {}).get('totalCount')
-        all_orders = result.get('allOrders', {}).get('edges', [])
-        total_orders = len(all_orders)
-        
-        # Calculate total revenue
-        total_revenue = sum(
-            order.get('node', {}).get('totalAmount', 0)
-            for order in all_orders
-        )
+        stats = result.get('crmStats', {})
+        total_customers = stats.get('customerCount')
+        total_orders = stats.get('orderCount')
+        total_revenue = float(stats.get('totalRevenue') or 0)
 
         # Log the report
         log_file_path = "/tmp/crm_report_log.txt"
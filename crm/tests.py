@@ -1,3 +1,1258 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Max, Min
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from gql import gql
+from gql.transport.requests import RequestsHTTPTransport
+
+from alx_backend_graphql_crm.schema import schema
+from .document_cache import query_hash
+from .exports import export_orders
+from .imports import get_importer
+from .graphql_client import InProcessTransport, get_client, get_http_session, load_schema_snapshot
+from .metrics import resolver_metrics
+from .models import Customer, CustomerSummary, Product, Order, OrderItem
+from .synthetic import init_order_worker, top_up_tables, write_order_chunk
+from .views import CachedGraphQLView
+
+
+ALL_ORDERS_QUERY = """
+    query AllOrders($first: Int) {
+        allOrders(first: $first) {
+            edges {
+                node {
+                    id
+                    customer { name }
+                    products { name price }
+                }
+            }
+        }
+    }
+"""
+
+
+def add_items(order, products):
+    """Adds one unit of each product to an order at its current price."""
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, product=product, unit_price=product.price) for product in products
+    )
+
+
+def execute(query, variables=None):
+    """Executes a document the way GraphQLView does, with a request as context."""
+    context = RequestFactory().post('/graphql')
+    result = schema.execute(query, variable_values=variables, context_value=context)
+    assert result.errors is None, result.errors
+    return result.data
+
+
+class OrderLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = [Product.objects.create(name=f"Product {i}", price=10 + i, stock=5) for i in range(3)]
+        for i in range(20):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            order = Order.objects.create(customer=customer)
+            add_items(order, products[:1 + i % 3])
+
+    def count_queries(self, first):
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(ALL_ORDERS_QUERY, {'first': first})
+        self.assertEqual(len(data['allOrders']['edges']), first)
+        return len(queries)
+
+    def test_query_count_is_constant_in_page_size(self):
+        self.assertEqual(self.count_queries(5), self.count_queries(20))
+
+    def test_differently_pruned_selections_stay_batched(self):
+        query = """
+            query Pruned($first: Int) {
+                a: allOrders(first: $first) { edges { node { customer { name } } } }
+                b: allOrders(first: $first) { edges { node { customer { email phone } } } }
+            }
+        """
+        counts = []
+        for first in (5, 20):
+            with CaptureQueriesContext(connection) as queries:
+                data = execute(query, {'first': first})
+            counts.append(len(queries))
+        self.assertEqual(counts, [2, 2])
+        self.assertEqual(data['b']['edges'][19]['node']['customer']['email'], "customer19@example.com")
+
+    def test_batched_fields_match_orm(self):
+        data = execute(ALL_ORDERS_QUERY, {'first': 20})
+        for edge, order in zip(data['allOrders']['edges'], Order.objects.order_by('pk')):
+            node = edge['node']
+            self.assertEqual(node['customer']['name'], order.customer.name)
+            expected = Order.product.through.objects.filter(order=order).order_by('id')
+            self.assertEqual(
+                [p['name'] for p in node['products']],
+                [row.product.name for row in expected]
+            )
+
+
+class QueryOptimizerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Laptop", price=999, stock=5)
+        customer = Customer.objects.create(name="Alice", email="alice@example.com", phone="+1234567890")
+        order = Order.objects.create(customer=customer)
+        add_items(order, [product])
+
+    def test_fragments_drive_joins_and_column_pruning(self):
+        query = """
+            query {
+                allOrders(first: 10) {
+                    edges { node { ...OrderFields } }
+                }
+            }
+            fragment OrderFields on OrderType {
+                totalAmount
+                customer { ... on CustomerType { name } }
+                products { name }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(query)
+
+        node = data['allOrders']['edges'][0]['node']
+        self.assertEqual(node['customer']['name'], "Alice")
+        self.assertEqual(node['products'][0]['name'], "Laptop")
+
+        # orders joined with customers, prefetched products
+        self.assertEqual(len(queries), 2)
+        orders_sql = queries[0]['sql']
+        self.assertIn('JOIN "crm_customer"', orders_sql)
+        self.assertNotIn('"crm_customer"."phone"', orders_sql)
+        self.assertNotIn('"crm_order"."updated_at"', orders_sql)
+
+
+class BulkCreateCustomersTests(TestCase):
+    def test_bulk_insert_reports_per_row_errors(self):
+        Customer.objects.create(name="Existing", email="existing@example.com")
+        query = """
+            mutation {
+                bulkCreateCustomers(batchSize: 2, input: [
+                    { name: "Bob", email: "bob@example.com", phone: "123-456-7890" },
+                    { name: "Carol", email: "carol@example.com" },
+                    { name: "Bob Again", email: "bob@example.com" },
+                    { name: "Existing", email: "existing@example.com" },
+                    { name: "Broken", email: "not-an-email" },
+                    { name: "Dave", email: "dave@example.com" }
+                ]) {
+                    customers { id name }
+                    errors
+                }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(query)['bulkCreateCustomers']
+
+        self.assertEqual([c['name'] for c in data['customers']], ["Bob", "Carol", "Dave"])
+        self.assertTrue(all(c['id'] for c in data['customers']))
+        self.assertEqual(len(data['errors']), 3)
+        self.assertEqual(Customer.objects.count(), 4)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+
+class UpdateLowStockProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for stock in (0, 5, 9, 10, 50):
+            Product.objects.create(name=f"Stock {stock}", price=1, stock=stock)
+
+    def restock(self, arguments):
+        query = f"""
+            mutation {{
+                updateLowStockProducts({arguments}) {{
+                    updatedCount
+                    updatedProducts {{ name stock }}
+                    message
+                }}
+            }}
+        """
+        return execute(query)['updateLowStockProducts']
+
+    def test_single_statement_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.restock("threshold: 10, increment: 5")
+        self.assertEqual(data['updatedCount'], 3)
+        self.assertEqual(sorted(p['stock'] for p in data['updatedProducts']), [5, 10, 14])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+
+    def test_increment_must_be_positive(self):
+        for increment in (0, -5):
+            data = self.restock(f"increment: {increment}")
+            self.assertEqual(data['updatedCount'], 0)
+            self.assertEqual(data['message'], "Error updating stock: Increment must be a positive number.")
+        self.assertEqual(
+            sorted(Product.objects.values_list('stock', flat=True)), [0, 5, 9, 10, 50]
+        )
+
+    def test_locked_chunks_match_single_statement(self):
+        data = self.restock("threshold: 10, lockRows: true, batchSize: 2")
+        self.assertEqual(data['updatedCount'], 3)
+        self.assertEqual(
+            sorted(Product.objects.values_list('stock', flat=True)),
+            [10, 10, 15, 19, 50]
+        )
+
+
+class CreateOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.laptop = Product.objects.create(name="Laptop", price="999.99", stock=10)
+        cls.mouse = Product.objects.create(name="Mouse", price="25.01", stock=10)
+
+    def test_create_order_computes_total_from_fetched_products(self):
+        query = f"""
+            mutation {{
+                createOrder(input: {{ customerId: {self.customer.pk}, productIds: [{self.laptop.pk}, {self.mouse.pk}] }}) {{
+                    order {{ totalAmount customer {{ name }} products {{ name }} }}
+                    message
+                }}
+            }}
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(query)['createOrder']
+
+        self.assertEqual(data['message'], "Order created successfully")
+        self.assertEqual(data['order']['totalAmount'], "1025.00")
+        self.assertEqual([p['name'] for p in data['order']['products']], ["Laptop", "Mouse"])
+        # The order, its items and the customer summary row
+        inserts = [q['sql'].split(' INTO ')[1].split()[0] for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(inserts, ['"crm_order"', '"crm_orderitem"', '"crm_customersummary"'])
+        # Stock is reserved with one conditional UPDATE for the whole order
+        updates = [q['sql'].split()[1] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(updates, ['"crm_product"', '"crm_customersummary"'])
+        self.assertEqual(Product.objects.get(pk=self.laptop.pk).stock, 9)
+
+    def test_create_orders_batch_reports_per_order_errors(self):
+        query = f"""
+            mutation {{
+                createOrders(input: [
+                    {{ customerId: {self.customer.pk}, productIds: [{self.laptop.pk}] }},
+                    {{ customerId: 999, productIds: [{self.laptop.pk}] }},
+                    {{ customerId: {self.customer.pk}, productIds: [{self.mouse.pk}, 999] }},
+                    {{ customerId: {self.customer.pk}, productIds: [{self.mouse.pk}] }}
+                ]) {{
+                    orders {{ totalAmount }}
+                    errors
+                }}
+            }}
+        """
+        data = execute(query)['createOrders']
+        self.assertEqual([o['totalAmount'] for o in data['orders']], ["999.99", "25.01"])
+        self.assertEqual(data['errors'], [
+            "Error for order 1: Error creating order: Customer not found.",
+            "Error for order 2: Error: Product(s) not found with IDs: 999",
+        ])
+        self.assertEqual(Order.product.through.objects.count(), 2)
+
+    def test_created_orders_resolve_customers_in_one_batch(self):
+        Product.objects.filter(pk=self.mouse.pk).update(stock=100)
+        customers = [self.customer] + [
+            Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com") for i in range(3)
+        ]
+
+        def count_queries(count):
+            inputs = ", ".join(
+                f"{{ customerId: {customers[i % 4].pk}, productIds: [{self.mouse.pk}] }}" for i in range(count)
+            )
+            query = f"""
+                mutation {{
+                    createOrders(input: [{inputs}]) {{ orders {{ customer {{ name orderCount }} }} }}
+                }}
+            """
+            with CaptureQueriesContext(connection) as queries:
+                data = execute(query)['createOrders']
+            self.assertEqual(len(data['orders']), count)
+            return len(queries)
+
+        self.assertEqual(count_queries(3), count_queries(8))
+
+    def test_items_keep_quantity_and_price_at_purchase(self):
+        query = f"""
+            mutation {{
+                createOrder(input: {{ customerId: {self.customer.pk}, items: [
+                    {{ productId: {self.laptop.pk} }},
+                    {{ productId: {self.mouse.pk}, quantity: 3 }}
+                ] }}) {{
+                    order {{ totalAmount items {{ quantity unitPrice lineTotal }} }}
+                }}
+            }}
+        """
+        order = execute(query)['createOrder']['order']
+        self.assertEqual(order['totalAmount'], "1075.02")
+        Product.objects.filter(pk=self.mouse.pk).update(price="30.00")
+
+        detail = """
+            query {
+                allOrders(first: 1) { edges { node { items { quantity unitPrice lineTotal } } } }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(detail)['allOrders']['edges'][0]['node']
+        self.assertEqual(data['items'], [
+            {'quantity': 1, 'unitPrice': "999.99", 'lineTotal': "999.99"},
+            {'quantity': 3, 'unitPrice': "25.01", 'lineTotal': "75.03"},
+        ])
+        self.assertEqual(data['items'], order['items'])
+        self.assertFalse([q for q in queries if 'crm_product' in q['sql']])
+
+        error = execute(f"""
+            mutation {{
+                createOrder(input: {{ customerId: {self.customer.pk}, items: [{{ productId: {self.mouse.pk}, quantity: 0 }}] }}) {{
+                    message
+                }}
+            }}
+        """)['createOrder']['message']
+        self.assertEqual(error, "Error: Quantity must be at least 1.")
+
+
+class StockReservationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.laptop = Product.objects.create(name="Laptop", price="999.99", stock=2)
+        cls.mouse = Product.objects.create(name="Mouse", price="25.01", stock=5)
+
+    def test_orders_that_would_oversell_are_rejected(self):
+        query = f"""
+            mutation {{
+                createOrders(input: [
+                    {{ customerId: {self.customer.pk}, items: [{{ productId: {self.laptop.pk}, quantity: 2 }}] }},
+                    {{ customerId: {self.customer.pk}, items: [
+                        {{ productId: {self.mouse.pk}, quantity: 2 }},
+                        {{ productId: {self.laptop.pk} }}
+                    ] }},
+                    {{ customerId: {self.customer.pk}, items: [{{ productId: {self.mouse.pk}, quantity: 5 }}] }}
+                ]) {{
+                    orders {{ totalAmount products {{ name stock }} }}
+                    errors
+                }}
+            }}
+        """
+        data = execute(query)['createOrders']
+        self.assertEqual(data['orders'], [
+            {'totalAmount': "1999.98", 'products': [{'name': "Laptop", 'stock': 0}]},
+            {'totalAmount': "125.05", 'products': [{'name': "Mouse", 'stock': 0}]},
+        ])
+        self.assertEqual(data['errors'], [
+            f"Error for order 1: Error: Insufficient stock for product IDs: {self.laptop.pk}",
+        ])
+        # The rejected order did not hold on to the mouse it asked for
+        self.assertEqual(
+            list(Product.objects.order_by('pk').values_list('stock', flat=True)), [0, 0]
+        )
+
+
+class CustomerSummaryTests(TestCase):
+    QUERY = """
+        query {
+            allCustomers(first: 10) {
+                edges { node { name orderCount lifetimeValue lastOrderDate } }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        cls.carol = Customer.objects.create(name="Carol", email="carol@example.com")
+        cls.laptop = Product.objects.create(name="Laptop", price="999.99", stock=10)
+        cls.mouse = Product.objects.create(name="Mouse", price="25.01", stock=10)
+
+    def summaries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(self.QUERY)
+        # Customers and their summaries, whatever the page size
+        self.assertEqual(len(queries), 2)
+        return {edge['node']['name']: edge['node'] for edge in data['allCustomers']['edges']}
+
+    def test_placed_orders_update_the_summary(self):
+        execute(f"""
+            mutation {{
+                createOrders(input: [
+                    {{ customerId: {self.alice.pk}, productIds: [{self.laptop.pk}] }},
+                    {{ customerId: {self.alice.pk}, items: [{{ productId: {self.mouse.pk}, quantity: 2 }}] }},
+                    {{ customerId: {self.bob.pk}, productIds: [{self.mouse.pk}] }}
+                ]) {{ errors }}
+            }}
+        """)
+        execute(f"""
+            mutation {{
+                createOrder(input: {{ customerId: {self.bob.pk}, productIds: [{self.laptop.pk}] }}) {{ message }}
+            }}
+        """)
+
+        summaries = self.summaries()
+        self.assertEqual(
+            [(s['orderCount'], s['lifetimeValue']) for s in summaries.values()],
+            [(2, "1050.01"), (2, "1025.00"), (0, "0.00")]
+        )
+        last_order = Order.objects.filter(customer=self.bob).latest('order_date')
+        self.assertEqual(summaries['Bob']['lastOrderDate'], last_order.order_date.isoformat())
+        self.assertIsNone(summaries['Carol']['lastOrderDate'])
+
+    def test_order_customers_load_their_summaries_in_one_batch(self):
+        for i in range(20):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            Order.objects.create(customer=customer)
+        query = """
+            query Summaries($first: Int) {
+                allOrders(first: $first) { edges { node { customer { orderCount } } } }
+            }
+        """
+        counts = []
+        for first in (5, 20):
+            with CaptureQueriesContext(connection) as queries:
+                data = execute(query, {'first': first})
+            self.assertEqual(len(data['allOrders']['edges']), first)
+            counts.append(len(queries))
+        # Orders joined with customers, then their summaries
+        self.assertEqual(counts, [2, 2])
+
+    def test_rebuild_command_recomputes_from_orders(self):
+        Order.objects.create(customer=self.alice, total_amount="10.00")
+        Order.objects.create(customer=self.alice, total_amount="5.50")
+        CustomerSummary.objects.create(customer=self.carol, order_count=3, lifetime_value="99.00")
+
+        out = StringIO()
+        call_command('rebuild_customer_summaries', batch_size=2, stdout=out)
+        self.assertIn("Rebuilt summaries of 1 customers", out.getvalue())
+        summaries = self.summaries()
+        self.assertEqual(summaries['Alice']['orderCount'], 2)
+        self.assertEqual(summaries['Alice']['lifetimeValue'], "15.50")
+        self.assertEqual(summaries['Carol']['orderCount'], 0)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = Customer.objects.create(name="Alice Smith", email="alice@example.com")
+        cls.bob = Customer.objects.create(name="Bob Jones", email="bob@alice.org")
+        cls.carol = Customer.objects.create(name="Carol White", email="carol@example.com")
+        cls.laptop = Product.objects.create(name="Laptop Pro", price=999, stock=5)
+        cls.mouse = Product.objects.create(name="Wireless Mouse", price=25, stock=5)
+        add_items(Order.objects.create(customer=cls.alice), [cls.mouse])
+        add_items(Order.objects.create(customer=cls.carol), [cls.laptop, cls.mouse])
+
+    def search(self, field, text, **args):
+        arguments = ", ".join([f"search: {json.dumps(text)}", *(f"{k}: {json.dumps(v)}" for k, v in args.items())])
+        node = "customer { name } products { name }" if field == 'allOrders' else "name"
+        data = execute(f"""
+            query {{
+                {field}({arguments}) {{
+                    edges {{ node {{ {node} }} }}
+                    pageInfo {{ endCursor hasNextPage }}
+                }}
+            }}
+        """)[field]
+        return data
+
+    def test_customers_are_ranked_and_paged_by_rank(self):
+        # Alice matches in both columns and ranks above Bob
+        first = self.search('allCustomers', "ali", first=1)
+        self.assertEqual([e['node']['name'] for e in first['edges']], ["Alice Smith"])
+        self.assertTrue(first['pageInfo']['hasNextPage'])
+        rest = self.search('allCustomers', "ali", first=5, after=first['pageInfo']['endCursor'])
+        self.assertEqual([e['node']['name'] for e in rest['edges']], ["Bob Jones"])
+        self.assertFalse(rest['pageInfo']['hasNextPage'])
+
+        names = lambda text: [e['node']['name'] for e in self.search('allCustomers', text)['edges']]
+        self.assertEqual(names("example carol"), ["Carol White"])
+        # Query syntax is ignored
+        self.assertEqual(names('ALICE" *('), ["Alice Smith", "Bob Jones"])
+        self.assertEqual(names("!!"), [])
+
+    def test_index_follows_saves_deletes_and_bulk_creates(self):
+        self.carol.name = "Caroline Alison"
+        self.carol.save()
+        self.bob.delete()
+        execute('mutation { bulkCreateCustomers(input: [{ name: "Alistair", email: "al@example.com" }]) { errors } }')
+
+        names = [e['node']['name'] for e in self.search('allCustomers', "ali")['edges']]
+        self.assertEqual(sorted(names), ["Alice Smith", "Alistair", "Caroline Alison"])
+
+    def test_products_and_orders(self):
+        products = self.search('allProducts', "lap")
+        self.assertEqual([e['node']['name'] for e in products['edges']], ["Laptop Pro"])
+
+        # Carol's order matches through its product, Alice's through the customer
+        orders = self.search('allOrders', "laptop")['edges']
+        self.assertEqual([e['node']['customer']['name'] for e in orders], ["Carol White"])
+        orders = self.search('allOrders', "alice")['edges']
+        self.assertEqual([e['node']['customer']['name'] for e in orders], ["Alice Smith"])
+        orders = self.search('allOrders', "mouse")['edges']
+        self.assertEqual(len(orders), 2)
+
+
+class GenerateDataTests(TestCase):
+    def test_generates_consistent_orders(self):
+        call_command(
+            'generate_data', orders=300, customers=30, products=15, batch_size=100, days=30, seed=7,
+            stdout=StringIO(),
+        )
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(Customer.objects.count(), 30)
+        self.assertEqual(Product.objects.count(), 15)
+
+        # Totals add up from the captured prices and dates are spread out
+        for order in Order.objects.prefetch_related('items')[:50]:
+            items = list(order.items.all())
+            self.assertTrue(1 <= len(items) <= 10)
+            self.assertEqual(order.total_amount, sum(item.line_total for item in items))
+        dates = Order.objects.aggregate(first=Min('order_date'), last=Max('order_date'))
+        self.assertGreater(dates['last'] - dates['first'], timedelta(days=7))
+
+        # Summaries and the search index cover the generated rows
+        self.assertEqual(
+            sum(CustomerSummary.objects.values_list('order_count', flat=True)), 300
+        )
+        name = Customer.objects.first().name.split()[0]
+        data = execute(f'query {{ allCustomers(search: "{name}") {{ edges {{ node {{ name }} }} }} }}')
+        self.assertTrue(data['allCustomers']['edges'])
+
+    def test_retried_chunks_link_items_to_their_orders(self):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        Product.objects.create(name="Laptop", price=10, stock=5)
+        init_order_worker(days=30)
+        bulk_create = OrderItem.objects.bulk_create
+        attempts = []
+
+        def locked_once(objs, *args, **kwargs):
+            attempts.append(objs)
+            items = bulk_create(objs, *args, **kwargs)
+            if len(attempts) == 1:
+                raise OperationalError("database is locked")
+            return items
+
+        def other_worker_writes(seconds):
+            # Takes the ids the rolled-back orders had
+            Order.objects.create(customer=customer)
+
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=locked_once), \
+                mock.patch('crm.synthetic.time.sleep', side_effect=other_worker_writes):
+            write_order_chunk((0, 3, 1))
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(Order.objects.count(), 4)
+        for order in Order.objects.prefetch_related('items'):
+            self.assertEqual(order.total_amount, sum(item.line_total for item in order.items.all()))
+
+    def test_benchmark_seeding_indexes_and_summarizes(self):
+        top_up_tables(100, batch_size=30)
+
+        self.assertEqual(Order.objects.count(), 100)
+        self.assertEqual(sum(CustomerSummary.objects.values_list('order_count', flat=True)), 100)
+        product = Product.objects.last()
+        data = execute(f'query {{ allProducts(search: "{product.name}") {{ edges {{ node {{ id }} }} }} }}')
+        self.assertTrue(data['allProducts']['edges'])
+
+
+class BenchmarkGraphQLTests(TestCase):
+    def test_results_are_saved_and_compared(self):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        products = [Product.objects.create(name=f"Product {i}", price=10, stock=5) for i in range(3)]
+        add_items(Order.objects.create(customer=customer), products)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            options = {'repeat': 2, 'warmup': 0, 'bulk_size': 10, 'stdout': StringIO()}
+            call_command('benchmark_graphql', output=path, **options)
+            with open(path) as f:
+                results = json.load(f)
+
+            out = StringIO()
+            call_command('benchmark_graphql', compare=path, only='allOrders', **{**options, 'stdout': out})
+
+        orders = results['cases']['allOrders first 20 with customer and products']
+        self.assertEqual(orders['runs'], 2)
+        self.assertGreater(orders['sql_queries'], 0)
+        self.assertLessEqual(orders['latency_ms']['p50'], orders['latency_ms']['max'])
+        self.assertGreater(orders['peak_memory_kib'], 0)
+        self.assertIn("bulkCreateCustomers of 10", results['cases'])
+        self.assertEqual(results['meta']['rows']['orders'], 1)
+        self.assertIn("allOrders first 100 with customer and products: p50", out.getvalue())
+        # Mutations were rolled back
+        self.assertEqual(Customer.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=products[0].pk).stock, 5)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("importer")
+        self.user.user_permissions.set(Permission.objects.filter(
+            content_type__app_label='crm', codename__in=['add_product', 'change_product'],
+        ))
+        self.client.force_login(self.user)
+
+    def test_import_command_upserts_customers_by_email(self):
+        Customer.objects.create(name="Old Name", email="alice@example.com")
+        rows = (
+            "name,email,phone\n"
+            "Alice,alice@example.com,+1234567890\n"
+            "Bob,bob@example.com,\n"
+            "Bad,not-an-email,\n"
+            "Bobby,bob@example.com,123-456-7890\n"
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'customers.csv')
+            with open(path, 'w') as f:
+                f.write(rows)
+            out, err = StringIO(), StringIO()
+            call_command('import_data', 'customers', path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(
+            list(Customer.objects.order_by('email').values_list('name', 'email', 'phone')),
+            [("Alice", "alice@example.com", "+1234567890"), ("Bobby", "bob@example.com", "123-456-7890")],
+        )
+        self.assertIn("Read 2 rows: 2 imported, 0 errors", out.getvalue())
+        self.assertIn("Imported 3 of 4 customers; 1 rows had errors.", out.getvalue())
+        self.assertIn("Line 4: email: Enter a valid email address.", err.getvalue())
+
+    def test_values_of_other_json_types_are_row_errors(self):
+        def run(kind, rows):
+            body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+            return get_importer(kind).run(BytesIO(body), 'ndjson')
+
+        report = run('customers', [
+            {'name': "Number", 'email': 123},
+            {'name': "Listed", 'email': "listed@example.com", 'phone': 5550100},
+        ])
+        self.assertEqual(report.errors, ["Line 1: email: Enter a valid email address."])
+        self.assertEqual(Customer.objects.get(email="listed@example.com").phone, "5550100")
+
+        report = run('products', [{'sku': 7, 'name': "Odd", 'price': [1], 'stock': {}}])
+        self.assertEqual(report.error_count, 1)
+        self.assertTrue(report.errors[0].startswith("Line 1: price:"))
+
+    def test_upload_validates_and_upserts_products_by_sku(self):
+        Product.objects.create(name="Laptop", price=999, stock=5, sku="LAP-1")
+        rows = [
+            {'sku': "LAP-1", 'name': "Laptop Pro", 'price': 1099.5, 'stock': 8},
+            {'sku': "MOU-1", 'name': "Wireless Mouse", 'price': "25.01"},
+            {'sku': "FREE-1", 'name': "Free", 'price': 0, 'stock': 1},
+            {'sku': "NEG-1", 'name': "Negative", 'price': 5, 'stock': -1},
+            {'name': "No SKU", 'price': 5},
+        ]
+        body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+        response = self.client.post('/import/products', body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['rows'], report['imported'], report['errorCount']), (6, 2, 4))
+        self.assertEqual(report['errors'][:2], [
+            "Line 3: price: Price must be a positive number.",
+            "Line 4: stock: Stock cannot be a negative number.",
+        ])
+        self.assertTrue(report['errors'][3].startswith("Line 6: Invalid JSON"))
+        self.assertEqual(
+            list(Product.objects.order_by('sku').values_list('sku', 'name', 'price', 'stock')),
+            [("LAP-1", "Laptop Pro", Decimal("1099.50"), 8), ("MOU-1", "Wireless Mouse", Decimal("25.01"), 0)],
+        )
+        # Imported rows are searchable without a rebuild
+        data = execute('{ allProducts(search: "wireless") { edges { node { sku } } } }')
+        self.assertEqual(data['allProducts']['edges'], [{'node': {'sku': "MOU-1"}}])
+
+    def test_upload_accepts_multipart_files(self):
+        upload = SimpleUploadedFile('products.csv', b"sku,name,price,stock\nKEY-1,Keyboard,45.00,3\n")
+        response = self.client.post('/import/products', {'file': upload})
+        self.assertEqual(response.json()['imported'], 1)
+        self.assertEqual(Product.objects.get(sku="KEY-1").stock, 3)
+
+        response = self.client.post('/import/orders', "", content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+
+    def test_upload_requires_permission_and_csrf_token(self):
+        body = "sku,name,price\nKEY-1,Keyboard,45.00\n"
+        # Allowed to import products, not customers
+        response = self.client.post('/import/customers', "email\nx@example.com\n", content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        response = self.client.post('/import/products', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 401)
+
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post('/import/products', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Product.objects.exists())
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        laptop = Product.objects.create(name="Laptop", price="999.99", stock=10)
+        mouse = Product.objects.create(name="Mouse", price="25.01", stock=10)
+        cls.alice_order = Order.objects.create(customer=alice, total_amount="1025.00")
+        add_items(cls.alice_order, [laptop, mouse])
+        cls.bob_order = Order.objects.create(customer=bob, total_amount="25.01")
+        add_items(cls.bob_order, [mouse])
+        cls.user = User.objects.create_user("exporter")
+        cls.user.user_permissions.add(Permission.objects.get(content_type__app_label='crm', codename='view_order'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    def test_command_writes_one_csv_line_per_item(self):
+        out = StringIO()
+        call_command('export_orders', filter=['customer_name=ali'], stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(
+            [(row['order_id'], row['customer_email'], row['product_name'], row['line_total']) for row in rows],
+            [(str(self.alice_order.pk), "alice@example.com", "Laptop", "999.99"),
+             (str(self.alice_order.pk), "alice@example.com", "Mouse", "25.01")],
+        )
+
+    def test_items_are_prefetched_per_chunk(self):
+        # Orders with their customers, then the items with their products
+        with self.assertNumQueries(2):
+            pieces = list(export_orders({}, 'ndjson'))
+        orders = [json.loads(line) for line in ''.join(pieces).splitlines()]
+        self.assertEqual([order['id'] for order in orders], [self.alice_order.pk, self.bob_order.pk])
+        self.assertEqual(orders[0]['items'][1], {
+            'productId': orders[0]['items'][1]['productId'],
+            'productName': "Mouse", 'quantity': 1, 'unitPrice': "25.01", 'lineTotal': "25.01",
+        })
+
+    def test_view_streams_orders_filtered_with_graphql_names(self):
+        # Both of Alice's products match, yet her order is exported once
+        response = self.client.get('/export/orders', {'format': 'ndjson', 'productName': "o"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], "application/x-ndjson; charset=utf-8")
+        orders = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([order['customer']['name'] for order in orders], ["Alice", "Bob"])
+
+        # Under ASGI the export is handed on piece by piece, not buffered
+        response = async_to_sync(self.async_client.get)('/export/orders', {'format': 'ndjson'})
+        self.assertTrue(response.is_async)
+
+        async def read(content):
+            return b''.join([piece async for piece in content])
+
+        lines = async_to_sync(read)(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.alice_order.pk, self.bob_order.pk])
+
+        response = self.client.get('/export/orders', {'orderDate_Gte': "not a date"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/export/orders', {'status': "paid"})
+        self.assertEqual(response.json(), {'errors': ["Unknown filters: status."]})
+
+    def test_view_requires_permission(self):
+        self.client.force_login(User.objects.create_user("viewer"))
+        response = self.client.get('/export/orders')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        response = self.client.get('/export/orders')
+        self.assertEqual(response.status_code, 401)
+
+
+class StockReservationStressTests(TransactionTestCase):
+    def test_concurrent_orders_never_oversell(self):
+        out = StringIO()
+        call_command('stress_orders', orders=60, threads=6, products=2, stock=10, stdout=out)
+        output = out.getvalue()
+        self.assertIn("nothing was oversold", output)
+        self.assertIn(" 0 failed", output)
+        self.assertFalse(Product.objects.exists())
+
+
+class DocumentCacheTests(TestCase):
+    def setUp(self):
+        CachedGraphQLView.document_cache.clear()
+
+    def post(self, body):
+        response = self.client.post('/graphql', json.dumps(body), content_type='application/json')
+        return response.json()
+
+    def test_repeated_documents_are_served_from_cache(self):
+        for _ in range(3):
+            self.assertEqual(self.post({'query': '{ hello }'})['data'], {'hello': "Hello, GraphQL!"})
+
+        stats = self.client.get('/graphql/cache-stats').json()
+        self.assertEqual((stats['size'], stats['hits'], stats['misses']), (1, 2, 1))
+
+    def test_automatic_persisted_queries(self):
+        query = '{ hello }'
+        persisted = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash(query)}}
+
+        result = self.post({'extensions': persisted})
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        self.post({'query': query, 'extensions': persisted})
+        self.assertEqual(self.post({'extensions': persisted})['data'], {'hello': "Hello, GraphQL!"})
+
+        mismatched = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash('{ other }')}}
+        result = self.post({'query': query, 'extensions': mismatched})
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_HASH_MISMATCH')
+
+
+@override_settings(CRM_RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    PRODUCTS_QUERY = '{ allProducts { edges { node { name stock } } } }'
+    CUSTOMERS_QUERY = '{ allCustomers { edges { node { name } } } }'
+
+    def setUp(self):
+        cache.clear()
+        Product.objects.create(name="Widget", price=5, stock=1)
+        Customer.objects.create(name="Alice", email="alice@example.com")
+
+    def post(self, query):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+        return response.json()['data']
+
+    def count_queries(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            self.post(query)
+        return len(queries)
+
+    def test_reads_are_cached_until_a_dependent_model_changes(self):
+        self.post(self.PRODUCTS_QUERY)
+        self.post(self.CUSTOMERS_QUERY)
+        self.assertEqual(self.count_queries(self.PRODUCTS_QUERY), 0)
+
+        self.post('mutation { updateLowStockProducts { updatedCount } }')
+
+        data = self.post(self.PRODUCTS_QUERY)
+        self.assertEqual(data['allProducts']['edges'][0]['node']['stock'], 11)
+        # Customers were not touched by the restock
+        self.assertEqual(self.count_queries(self.CUSTOMERS_QUERY), 0)
+
+    def test_nested_relations_are_dependencies(self):
+        customer = Customer.objects.get(email="alice@example.com")
+        add_items(Order.objects.create(customer=customer), Product.objects.all())
+        query = '{ allProducts(first: 5) { edges { node { orderSet(first: 5) { edges { node { customer { name } } } } } } } }'
+        self.post(query)
+        self.assertEqual(self.count_queries(query), 0)
+
+        customer.name = "Alicia"
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.save()
+
+        data = self.post(query)
+        orders = data['allProducts']['edges'][0]['node']['orderSet']['edges']
+        self.assertEqual(orders[0]['node']['customer']['name'], "Alicia")
+
+    def test_create_product_evicts_product_results(self):
+        self.post(self.PRODUCTS_QUERY)
+        self.post('mutation { createProduct(input: { name: "Gadget", price: "3.50", stock: 2 }) { message } }')
+        data = self.post(self.PRODUCTS_QUERY)
+        self.assertEqual(len(data['allProducts']['edges']), 2)
+
+
+class KeysetPaginationTests(TestCase):
+    PAGE_QUERY = """
+        query Page($first: Int, $after: String, $last: Int, $before: String) {
+            allOrders(first: $first, after: $after, last: $last, before: $before) {
+                totalCount
+                pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+                edges { node { id } }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        cls.orders = [Order.objects.create(customer=customer) for _ in range(5)]
+        # Identical timestamps must still page deterministically by id
+        Order.objects.filter(pk__in=[o.pk for o in cls.orders[1:3]]).update(order_date=cls.orders[1].order_date)
+
+    def page(self, **variables):
+        return execute(self.PAGE_QUERY, variables)['allOrders']
+
+    def test_forward_pagination_visits_every_order_once(self):
+        seen = []
+        after = None
+        while True:
+            page = self.page(first=2, after=after)
+            self.assertEqual(page['totalCount'], 5)
+            seen.extend(edge['node']['id'] for edge in page['edges'])
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_pages_seek_without_offset_or_count(self):
+        first_page = self.page(first=2)
+        with CaptureQueriesContext(connection) as queries:
+            execute(
+                'query($after: String) { allOrders(first: 2, after: $after) { edges { node { id } } } }',
+                {'after': first_page['pageInfo']['endCursor']}
+            )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('OFFSET', queries[0]['sql'])
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_backward_pagination(self):
+        last_page = self.page(last=2)
+        self.assertTrue(last_page['pageInfo']['hasPreviousPage'])
+        previous = self.page(last=3, before=last_page['pageInfo']['startCursor'])
+        self.assertFalse(previous['pageInfo']['hasPreviousPage'])
+        self.assertEqual(len(previous['edges']), 3)
+
+    def test_negative_page_sizes_are_rejected(self):
+        for name in ('first', 'last'):
+            result = schema.execute(
+                self.PAGE_QUERY, variable_values={name: -1}, context_value=RequestFactory().post('/graphql')
+            )
+            self.assertEqual(
+                [error.message for error in result.errors], [f"Argument '{name}' must be a non-negative integer."]
+            )
+
+
+class CrmStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        Customer.objects.create(name="Bob", email="bob@example.com")
+        for amount in ("10.00", "15.50", "4.50"):
+            Order.objects.create(customer=alice, total_amount=amount)
+
+    def test_totals_come_from_constant_aggregate_queries(self):
+        query = '{ crmStats(groupBy: WEEK) { customerCount orderCount totalRevenue periods { orderCount revenue } } }'
+        with CaptureQueriesContext(connection) as queries:
+            data = execute(query)['crmStats']
+
+        self.assertEqual(data['customerCount'], 2)
+        self.assertEqual(data['orderCount'], 3)
+        self.assertEqual(data['totalRevenue'], "30.00")
+        self.assertEqual(data['periods'], [{'orderCount': 3, 'revenue': "30.00"}])
+        # customers, order totals, weekly groups
+        self.assertEqual(len(queries), 3)
+
+
+class InProcessClientTests(TestCase):
+    def test_jobs_execute_in_process_without_http(self):
+        Product.objects.create(name="Widget", price=5, stock=1)
+        client = get_client()
+        self.assertIsInstance(client.transport, InProcessTransport)
+
+        self.assertEqual(client.execute(gql('{ hello }')), {'hello': "Hello, GraphQL!"})
+        result = client.execute(gql('mutation { updateLowStockProducts { updatedCount } }'))
+        self.assertEqual(result['updateLowStockProducts']['updatedCount'], 1)
+        self.assertEqual(Product.objects.get().stock, 11)
+
+    @override_settings(CRM_GRAPHQL_TRANSPORT='http')
+    def test_http_client_is_pooled_and_uses_the_schema_snapshot(self):
+        client = get_client()
+        self.assertIs(get_client(), client)
+        self.assertIsInstance(client.transport, RequestsHTTPTransport)
+        self.assertFalse(client.fetch_schema_from_transport)
+        self.assertIsNotNone(client.schema)
+
+        client.transport.connect()
+        self.assertIs(client.transport.session, get_http_session())
+        client.transport.close()
+
+    def test_schema_snapshot_is_current(self):
+        self.assertEqual(load_schema_snapshot().strip(), str(schema).strip())
+
+
+class OrderRemindersTests(TestCase):
+    def test_one_reminder_per_customer_in_the_window(self):
+        from crm.cron_jobs.send_order_reminders import send_order_reminders
+
+        customers = [
+            Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com") for i in range(4)
+        ]
+        # Seven recent orders from three customers, spread over four pages
+        for i in range(7):
+            Order.objects.create(customer=customers[i % 3])
+        # Customer 3 only ordered before the window
+        old = Order.objects.create(customer=customers[3])
+        Order.objects.filter(pk=old.pk).update(order_date=timezone.now() - timedelta(days=8))
+
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'reminders.txt')
+            with mock.patch('crm.cron_jobs.send_order_reminders.LOG_FILE', log_path), \
+                    redirect_stdout(StringIO()):
+                reminded = send_order_reminders(page_size=2, batch_size=2)
+            with open(log_path) as f:
+                lines = f.read().splitlines()
+
+        self.assertEqual(reminded, 3)
+        emails = [line.rsplit("Customer Email: ", 1)[1] for line in lines]
+        self.assertEqual(sorted(emails), ["customer0@example.com", "customer1@example.com", "customer2@example.com"])
+
+
+class AsyncGraphQLViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        products = [Product.objects.create(name=f"Product {i}", price=10 + i, stock=5) for i in range(3)]
+        for i in range(6):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            order = Order.objects.create(customer=customer, total_amount=5)
+            add_items(order, products[:1 + i % 3])
+
+    def post(self, query, variables=None):
+        response = async_to_sync(self.async_client.post)(
+            '/graphql/async', {'query': query, 'variables': variables}, content_type='application/json'
+        )
+        return response.json()
+
+    def test_queries_match_the_sync_view_and_stay_batched(self):
+        with CaptureQueriesContext(connection) as sync_queries:
+            expected = execute(ALL_ORDERS_QUERY, {'first': 6})
+        with CaptureQueriesContext(connection) as async_queries:
+            result = self.post(ALL_ORDERS_QUERY, {'first': 6})
+
+        self.assertEqual(result['data'], expected)
+        self.assertEqual(len(async_queries), len(sync_queries))
+
+    def test_aggregates_and_sync_only_fields(self):
+        result = self.post("""
+            {
+                crmStats(groupBy: DAY) { customerCount orderCount totalRevenue periods { orderCount } }
+                allCustomers(first: 2) { totalCount edges { node { orderSet(first: 5) { totalCount } } } }
+            }
+        """)
+
+        self.assertNotIn('errors', result)
+        stats = result['data']['crmStats']
+        self.assertEqual((stats['customerCount'], stats['orderCount'], stats['totalRevenue']), (6, 6, "30.00"))
+        self.assertEqual(stats['periods'], [{'orderCount': 6}])
+        customers = result['data']['allCustomers']
+        self.assertEqual(customers['totalCount'], 6)
+        self.assertEqual([edge['node']['orderSet']['totalCount'] for edge in customers['edges']], [1, 1])
+
+    def test_mutations_run_on_the_sync_path(self):
+        result = self.post('mutation { createCustomer(input: {name: "Eve", email: "eve@example.com"}) { message } }')
+
+        self.assertEqual(result['data']['createCustomer']['message'], "Customer created successfully.")
+        self.assertTrue(Customer.objects.filter(email="eve@example.com").exists())
+
+
+class BatchRequestTests(TestCase):
+    STOCK_QUERY = "{ allOrders(first: 6) { edges { node { customer { name } products { name stock } } } } }"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [Product.objects.create(name=f"Product {i}", price=10 + i, stock=5) for i in range(3)]
+        for i in range(6):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            order = Order.objects.create(customer=customer, total_amount=5)
+            add_items(order, cls.products[:1 + i % 3])
+
+    def post(self, body, path='/graphql'):
+        return self.client.post(path, json.dumps(body), content_type='application/json')
+
+    def test_operations_share_loaders(self):
+        query = """
+            query Summaries($first: Int) {
+                allOrders(first: $first) { edges { node { customer { name orderCount } } } }
+            }
+        """
+        operations = [
+            {'id': "all", 'query': query, 'variables': {'first': 6}},
+            {'id': "some", 'query': query, 'variables': {'first': 3}},
+        ]
+        with CaptureQueriesContext(connection) as separate:
+            expected = [self.post(operation).json() for operation in operations]
+        with CaptureQueriesContext(connection) as batched:
+            response = self.post(operations)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([(result['id'], result['status']) for result in results], [("all", 200), ("some", 200)])
+        self.assertEqual([result['data'] for result in results], [result['data'] for result in expected])
+        # The second operation's customer summaries were already loaded
+        self.assertLess(len(batched), len(separate))
+
+    def test_operations_selecting_different_columns_stay_batched(self):
+        for i in range(6, 20):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            Order.objects.create(customer=customer, total_amount=5)
+        names = "query Names($first: Int) { allOrders(first: $first) { edges { node { customer { name } } } } }"
+        contacts = (
+            "query Contacts($first: Int) { allOrders(first: $first) "
+            "{ edges { node { customer { email phone orderCount } } } } }"
+        )
+
+        counts = []
+        for first in (5, 20):
+            operations = [
+                {'query': names, 'variables': {'first': first}},
+                {'query': contacts, 'variables': {'first': first}},
+            ]
+            with CaptureQueriesContext(connection) as separate:
+                for operation in operations:
+                    self.post(operation)
+            with CaptureQueriesContext(connection) as batched:
+                results = self.post(operations).json()
+            self.assertEqual(results[1]['data']['allOrders']['edges'][first - 1]['node']['customer']['email'],
+                             f"customer{first - 1}@example.com")
+            self.assertLessEqual(len(batched), len(separate))
+            counts.append(len(batched))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_operations_after_a_mutation_load_afresh(self):
+        create_order = {'query': """
+            mutation PlaceOrder($input: OrderInput!) { createOrder(input: $input) { order { id } } }
+        """, 'variables': {'input': {'customerId': Customer.objects.first().pk, 'productIds': [self.products[0].pk]}}}
+        for path in ('/graphql', '/graphql/async'):
+            with self.subTest(path=path):
+                stock = Product.objects.get(pk=self.products[0].pk).stock
+                before, placed, after = self.post(
+                    [{'query': self.STOCK_QUERY}, create_order, {'query': self.STOCK_QUERY}], path
+                ).json()
+
+                self.assertNotIn('errors', placed)
+                stocks = [
+                    {product['stock'] for edge in result['data']['allOrders']['edges']
+                     for product in edge['node']['products'] if product['name'] == "Product 0"}
+                    for result in (before, after)
+                ]
+                self.assertEqual(stocks, [{stock}, {stock - 1}])
+
+    def test_batch_size_is_capped(self):
+        response = self.post([{'query': "{ __typename }"}] * 11)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['message'], "Batch requests may hold at most 10 operations.")
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(len(self.post([{'query': "{ __typename }"}] * 10).json()), 10)
+
+
+class QueryCostTests(TestCase):
+    NESTED_QUERY = """
+        query Nested($customers: Int, $orders: Int) {
+            allCustomers(first: $customers) {
+                edges { node { orderSet(first: $orders) { edges { node { product(first: 100) { edges { node { name } } } } } } } }
+            }
+        }
+    """
+
+    def post(self, query, variables=None):
+        return self.client.post(
+            '/graphql', {'query': query, 'variables': variables}, content_type='application/json'
+        )
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post(ALL_ORDERS_QUERY, {'first': 6})
+
+        self.assertEqual(response.status_code, 200)
+        # connection, 6 edges, nodes and customers, 10 assumed products per order
+        self.assertEqual(response.json()['extensions'], {'cost': 79})
+
+    def test_over_budget_queries_are_rejected_before_execution(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(self.NESTED_QUERY, {'customers': 100, 'orders': 100})
+
+        self.assertEqual(response.status_code, 400)
+        error = response.json()['errors'][0]
+        self.assertEqual(error['extensions']['code'], 'QUERY_COST_EXCEEDED')
+        self.assertGreater(response.json()['extensions']['cost'], 5000)
+        self.assertEqual(len(queries), 0)
+
+    def test_negative_page_sizes_do_not_offset_other_fields(self):
+        query = """
+            query Nested($customers: Int, $orders: Int) {
+                big: allCustomers(first: $customers) {
+                    edges { node { orderSet(first: $orders) { edges { node { id } } } } }
+                }
+                neg: allCustomers(first: -100000) {
+                    edges { node { orderSet(first: 100) { edges { node { id } } } } }
+                }
+            }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(query, {'customers': 100, 'orders': 100})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_COST_EXCEEDED')
+        self.assertEqual(len(queries), 0)
+
+    def test_cost_follows_the_page_size_variables(self):
+        response = self.post(self.NESTED_QUERY, {'customers': 2, 'orders': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('errors', response.json())
+
+    def test_depth_limit(self):
+        query = """
+            { allOrders(first: 1) { edges { node { customer { orderSet(first: 1) { edges { node {
+                customer { orderSet(first: 1) { edges { node { id } } } }
+            } } } } } } } }
+        """
+        response = self.post(query)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("exceeds maximum operation depth", response.json()['errors'][0]['message'])
+
+    def test_unknown_fragments_are_validation_errors(self):
+        response = self.post("{ allOrders(first: 1) { edges { node { ...Missing } } } }")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['message'], "Unknown fragment 'Missing'.")
+
+
+class ResolverMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(name="Widget", price=5, stock=5)
+        for i in range(3):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            add_items(Order.objects.create(customer=customer), [product])
+
+    def setUp(self):
+        resolver_metrics.clear()
+
+    def post(self, query, variables=None):
+        return self.client.post(
+            '/graphql', {'query': query, 'variables': variables}, content_type='application/json'
+        ).json()
+
+    @override_settings(CRM_GRAPHQL_RESOLVER_EXTENSIONS=True)
+    def test_sql_is_attributed_to_resolver_paths(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = self.post(ALL_ORDERS_QUERY, {'first': 3})
+
+        resolvers = {entry['path']: entry for entry in result['extensions']['resolvers']}
+        self.assertEqual(resolvers['allOrders']['calls'], 1)
+        self.assertGreaterEqual(resolvers['allOrders']['sqlQueries'], 1)
+        self.assertEqual(resolvers['allOrders.edges.node.customer']['calls'], 3)
+        self.assertNotIn('allOrders.edges.node.id', resolvers)
+        self.assertEqual(sum(entry['sqlQueries'] for entry in resolvers.values()), len(queries))
+
+    def test_extensions_are_opt_in(self):
+        result = self.post('{ hello }')
+
+        self.assertNotIn('resolvers', result['extensions'])
+
+    def test_prometheus_export(self):
+        self.post(ALL_ORDERS_QUERY, {'first': 3})
+        response = self.client.get('/graphql/metrics')
+
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE crm_graphql_resolver_calls_total counter', body)
+        self.assertIn('crm_graphql_resolver_calls_total{field="Query.allOrders"} 1', body)
+        self.assertIn('crm_graphql_resolver_calls_total{field="OrderType.customer"} 3', body)
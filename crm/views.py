@@ -1,3 +1,495 @@
-from django.shortcuts import render
+import json
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBadRequest
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, OperationType, execute, get_operation_ast, parse
+from graphql.error import GraphQLError
+from graphql.validation import validate
+
+from alx_backend_graphql_crm.schema import cost_validation_rules, validation_rules
+from .document_cache import CachedDocument, document_cache, query_hash
+from .exports import CONTENT_TYPES, InvalidExport, aiterate, export_orders
+from .imports import InvalidImport, detect_format, get_importer
+from .metrics import resolver_metrics
+from .response_cache import response_cache
+
+
+class CachedGraphQLView(GraphQLView):
+    """
+    GraphQLView that parses and validates each distinct query document once.
+
+    Documents are kept in an LRU cache keyed by the sha256 of the query
+    text, which also serves Automatic Persisted Queries: requests carrying
+    ``extensions.persistedQuery.sha256Hash`` may omit the query entirely.
+    Results of read-only queries go through the opt-in response cache.
+
+    Every operation's estimated cost is checked against its budget with the
+    request's variables before execution and reported in
+    ``extensions.cost``.
+
+    A JSON array of operations is executed as a batch of at most
+    ``CRM_GRAPHQL_MAX_BATCH_SIZE``, in order and sharing the request's
+    DataLoaders, and answered with an array of results.
+    """
+    document_cache = document_cache
+    validation_rules = validation_rules
+    max_batch_size = getattr(settings, 'CRM_GRAPHQL_MAX_BATCH_SIZE', 10)
+
+    def parse_body(self, request):
+        """Parses JSON bodies as GraphQLView does, also accepting an array of operations."""
+        if self.get_content_type(request) != "application/json":
+            return super().parse_body(request)
+
+        try:
+            data = json.loads(request.body.decode("utf-8"))
+        except UnicodeDecodeError as e:
+            raise HttpError(HttpResponseBadRequest(str(e)))
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest("POST body sent invalid JSON."))
+
+        if isinstance(data, list):
+            if not data:
+                raise HttpError(HttpResponseBadRequest("Received an empty list in the batch request."))
+            if len(data) > self.max_batch_size:
+                raise HttpError(HttpResponseBadRequest(
+                    f"Batch requests may hold at most {self.max_batch_size} operations."
+                ))
+            if not all(isinstance(entry, dict) for entry in data):
+                raise HttpError(HttpResponseBadRequest("Every operation in a batch must be a JSON object."))
+        elif not isinstance(data, dict):
+            raise HttpError(HttpResponseBadRequest("The received data is not a valid JSON query."))
+        return data
+
+    def start_batch_operation(self, request):
+        """Resets the per-operation request state before the next operation of a batch."""
+        request.graphql_batch = True
+        setattr(request, MUTATION_ERRORS_FLAG, False)
+        request.resolver_metrics = None
+
+    def encode_batch(self, responses):
+        """Joins encoded results into an array, with the worst of their status codes."""
+        content = "[{}]".format(",".join(content for content, _ in responses))
+        return content, max(status_code for _, status_code in responses)
+
+    def get_batch_response(self, request, data):
+        responses = []
+        for entry in data:
+            self.start_batch_operation(request)
+            responses.append(self.get_response(request, entry))
+        return self.encode_batch(responses)
+
+    def get_persisted_query_hash(self, request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted_query = (extensions or {}).get('persistedQuery') or {}
+        return persisted_query.get('sha256Hash')
+
+    def get_document(self, query, key=None):
+        """Returns the cached document for a query, parsing and validating on a miss."""
+        key = key or query_hash(query)
+        entry = self.document_cache.get(key)
+        if entry is not None:
+            return entry
+
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            entry = CachedDocument(query, None, [e])
+        else:
+            errors = validate(
+                self.schema.graphql_schema,
+                document,
+                self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+            entry = CachedDocument(query, document, errors)
+
+        self.document_cache.set(key, entry)
+        return entry
+
+    def get_request_document(self, request, data, query, show_graphiql=False):
+        """
+        Returns the document a request asks to execute, by query text or by
+        persisted query hash, or None when there is nothing to execute.
+        """
+        sha256_hash = self.get_persisted_query_hash(request, data)
+        if not query and not sha256_hash:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        if query:
+            if sha256_hash and query_hash(query) != sha256_hash:
+                return CachedDocument(query, None, [GraphQLError(
+                    "provided sha does not match query",
+                    extensions={'code': 'PERSISTED_QUERY_HASH_MISMATCH'},
+                )])
+            return self.get_document(query)
+
+        entry = self.document_cache.get(sha256_hash)
+        if entry is None:
+            return CachedDocument(None, None, [GraphQLError(
+                "PersistedQueryNotFound",
+                extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'},
+            )])
+        return entry
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        entry = self.get_request_document(request, data, query, show_graphiql)
+        if entry is None:
+            return None
+        if entry.errors:
+            return ExecutionResult(data=None, errors=entry.errors)
+
+        cost, errors = self.analyze_cost(entry.document, variables, operation_name)
+        if errors:
+            return ExecutionResult(data=None, errors=errors, extensions={'cost': cost})
+
+        result = self.execute_entry(request, entry, variables, operation_name, show_graphiql)
+        if result is not None:
+            result.extensions = {**(result.extensions or {}), **self.get_extensions(request, cost)}
+        return result
+
+    def get_extensions(self, request, cost):
+        """The ``extensions`` added to every executed result."""
+        extensions = {'cost': cost}
+        request_metrics = getattr(request, 'resolver_metrics', None)
+        if request_metrics is not None and getattr(settings, 'CRM_GRAPHQL_RESOLVER_EXTENSIONS', False):
+            extensions['resolvers'] = request_metrics.as_list()
+        return extensions
+
+    def analyze_cost(self, document, variables, operation_name):
+        """Returns the estimated cost of the operation to execute and any over-budget errors."""
+        costs = {}
+        errors = validate(
+            self.schema.graphql_schema, document, cost_validation_rules(variables, costs.update)
+        )
+        if operation_name is None and len(costs) == 1:
+            return next(iter(costs.values())), errors
+        return costs.get(operation_name), errors
+
+    def execute_entry(self, request, entry, variables, operation_name, show_graphiql=False):
+        """Executes a valid document, through the response cache for reads."""
+        cache_key = response_cache.get_key(self.schema.graphql_schema, entry, variables, operation_name)
+        if cache_key is not None:
+            data = response_cache.get(cache_key)
+            if data is not None:
+                return ExecutionResult(data=data)
+
+        result = self.execute_document(request, entry.document, variables, operation_name, show_graphiql)
+        if cache_key is not None and result is not None and not result.errors:
+            response_cache.set(cache_key, result.data)
+        return result
+
+    def get_response(self, request, data, show_graphiql=False):
+        if isinstance(data, list):
+            return self.get_batch_response(request, data)
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+        return self.encode_result(request, execution_result, id, show_graphiql)
+
+    def encode_result(self, request, execution_result, id=None, show_graphiql=False):
+        """Serializes a result as GraphQLView does, keeping its extensions."""
+        if not execution_result:
+            return None, 200
+
+        status_code = 200
+        response = {}
+        if execution_result.errors:
+            set_rollback()
+            response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+        if execution_result.errors and any(
+            not getattr(e, "path", None) for e in execution_result.errors
+        ):
+            status_code = 400
+        else:
+            response["data"] = execution_result.data
+
+        if execution_result.extensions:
+            response["extensions"] = execution_result.extensions
+
+        if self.batch or getattr(request, 'graphql_batch', False):
+            response["id"] = id
+            response["status"] = status_code
+
+        return self.json_encode(request, response, pretty=show_graphiql), status_code
+
+    def execute_document(self, request, document, variables, operation_name, show_graphiql=False):
+        """Executes an already validated document, as GraphQLView does after validation."""
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if operation_ast is not None and operation_ast.operation == OperationType.MUTATION:
+                # Loaded rows may be stale once written; later operations of a batch load afresh
+                self.discard_loaders(execute_options["context_value"])
+                try:
+                    return self.execute_mutation(request, document, execute_options)
+                finally:
+                    self.discard_loaders(execute_options["context_value"])
+
+            return execute(self.schema.graphql_schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def execute_mutation(self, request, document, execute_options):
+        if (
+            graphene_settings.ATOMIC_MUTATIONS is True
+            or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+        ):
+            with transaction.atomic():
+                result = execute(self.schema.graphql_schema, document, **execute_options)
+                if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                    transaction.set_rollback(True)
+            return result
+        return execute(self.schema.graphql_schema, document, **execute_options)
+
+    @staticmethod
+    def discard_loaders(context):
+        if context is not None:
+            context.loaders = None
+
+
+class SyncResolverMiddleware:
+    """
+    Retries resolvers that have no async path in a worker thread.
+
+    Resolvers written for the async view return awaitables without
+    touching the database. The rest, such as the reverse relation
+    connections (``orderSet``), raise ``SynchronousOnlyOperation`` on their
+    first query from the event loop and are run again via ``sync_to_async``.
+    """
+    def resolve(self, next, root, info, **args):
+        try:
+            return next(root, info, **args)
+        except SynchronousOnlyOperation:
+            return sync_to_async(next)(root, info, **args)
+
+
+class AsyncGraphQLView(CachedGraphQLView):
+    """
+    CachedGraphQLView for the ASGI application that executes queries on
+    the event loop.
+
+    Query resolvers use Django's async ORM, so a slow database query
+    suspends its request instead of holding a worker thread. Mutations
+    keep the sync path in a thread, where atomic blocks are available.
+    """
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            result, status_code = await self.aget_response(request, data)
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    def start_batch_operation(self, request):
+        super().start_batch_operation(request)
+        # Mutations after a query of the batch run on the sync path
+        request.async_execution = False
+
+    async def aget_response(self, request, data):
+        if isinstance(data, list):
+            responses = []
+            for entry in data:
+                self.start_batch_operation(request)
+                responses.append(await self.aget_response(request, entry))
+            return self.encode_batch(responses)
+
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = await self.aexecute_graphql_request(
+            request, data, query, variables, operation_name
+        )
+        return self.encode_result(request, execution_result, id)
+
+    async def aexecute_graphql_request(self, request, data, query, variables, operation_name):
+        entry = self.get_request_document(request, data, query)
+        if entry.errors:
+            return ExecutionResult(data=None, errors=entry.errors)
+
+        cost, errors = self.analyze_cost(entry.document, variables, operation_name)
+        if errors:
+            return ExecutionResult(data=None, errors=errors, extensions={'cost': cost})
+
+        result = await self.aexecute_entry(request, entry, variables, operation_name)
+        result.extensions = {**(result.extensions or {}), **self.get_extensions(request, cost)}
+        return result
+
+    async def aexecute_entry(self, request, entry, variables, operation_name):
+        operation_ast = get_operation_ast(entry.document, operation_name)
+        if operation_ast is not None and operation_ast.operation != OperationType.QUERY:
+            return await sync_to_async(self.execute_document)(
+                request, entry.document, variables, operation_name
+            )
+
+        cache_key = None
+        if response_cache.enabled:
+            cache_key = await sync_to_async(response_cache.get_key)(
+                self.schema.graphql_schema, entry, variables, operation_name
+            )
+        if cache_key is not None:
+            data = await response_cache.aget(cache_key)
+            if data is not None:
+                return ExecutionResult(data=data)
+
+        request.async_execution = True
+        try:
+            result = execute(
+                self.schema.graphql_schema,
+                entry.document,
+                root_value=self.get_root_value(request),
+                context_value=self.get_context(request),
+                variable_values=variables,
+                operation_name=operation_name,
+                middleware=[SyncResolverMiddleware(), *(self.get_middleware(request) or [])],
+            )
+            if isawaitable(result):
+                result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        if cache_key is not None and not result.errors:
+            await response_cache.aset(cache_key, result.data)
+        return result
+
+
+def document_cache_stats(request):
+    """Reports hit/miss counters of the GraphQL document cache."""
+    return JsonResponse(CachedGraphQLView.document_cache.stats())
+
+
+def graphql_metrics(request):
+    """Exports resolver timings and SQL counts in the Prometheus text format."""
+    return HttpResponse(
+        resolver_metrics.prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def import_upload(request, kind):
+    """
+    Imports customers or products from an uploaded CSV or NDJSON file.
+
+    The file is either the ``file`` field of a multipart form, which Django
+    spools to disk when large, or the raw request body with a ``text/csv``
+    or ``application/x-ndjson`` content type. Either way it is parsed line
+    by line as it is upserted. ``?format=`` overrides the detected format.
+
+    Imports overwrite existing rows, so they take a logged-in user allowed
+    to add and change the imported model, with the session's CSRF token.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not request.user.is_authenticated:
+        return JsonResponse({'errors': ["Authentication required."]}, status=401)
+
+    try:
+        importer = get_importer(kind)
+        if not request.user.has_perms(importer.permissions):
+            return JsonResponse({'errors': [f"You do not have permission to import {kind}."]}, status=403)
+        if request.content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise InvalidImport("Upload the file in the 'file' field.")
+            format = request.GET.get('format') or detect_format(upload.name, upload.content_type)
+            lines = upload
+        else:
+            format = request.GET.get('format') or detect_format(content_type=request.content_type)
+            lines = request
+        report = importer.run(lines, format)
+    except InvalidImport as e:
+        return JsonResponse({'errors': [str(e)]}, status=400)
+    return JsonResponse(report.as_dict())
+
+
+def export_orders_view(request):
+    """
+    Streams orders as CSV or NDJSON (``?format=``, CSV by default). The
+    other query parameters are ``OrderFilter`` arguments, as in
+    ``allOrders``.
+
+    Exports hold every customer's name and email, so they take a logged-in
+    user allowed to view orders.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not request.user.is_authenticated:
+        return JsonResponse({'errors': ["Authentication required."]}, status=401)
+    if not request.user.has_perm('crm.view_order'):
+        return JsonResponse({'errors': ["You do not have permission to export orders."]}, status=403)
+
+    params = request.GET.dict()
+    format = params.pop('format', 'csv')
+    try:
+        pieces = export_orders(params, format)
+    except InvalidExport as e:
+        return JsonResponse({'errors': [str(e)]}, status=400)
+    if isinstance(request, ASGIRequest):
+        pieces = aiterate(pieces)
+    response = StreamingHttpResponse(pieces, content_type=f"{CONTENT_TYPES[format]}; charset=utf-8")
+    response['Content-Disposition'] = f'attachment; filename="orders.{format}"'
+    return response